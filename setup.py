@@ -35,4 +35,8 @@ setup(
         'pymunk',
         'pandas',
         'seaborn',
-    ])
+    ],
+    extras_require={
+        'parquet': ['pyarrow'],
+        'numba': ['numba'],
+    })
@@ -9,7 +9,6 @@ the final time and state of all agents upon their death.
 
 from vivarium.core.composer import Composer
 from vivarium.core.process import Deriver
-from vivarium.library.dict_utils import deep_merge
 from vivarium.processes.clock import Clock
 
 
@@ -35,12 +34,20 @@ class DeathLogger(Composer):
 
 
 def append_log(current_value, new_value):
-    log = deep_merge(dict(current_value), new_value)
-    return log
+    """
+    add the entries of `new_value` to a new copy of the log. Each entry is a (time, death) tuple,
+    so the logs are merged at the top level, and the previously emitted logs are not modified.
+    """
+    return {**current_value, **new_value}
 
 
 class Logger(Deriver):
-    """ Saves the most recent death state."""
+    """
+    Saves the most recent time and death state of the agents that died.
+
+    Only agents with a death state are logged, so the log grows with the number of deaths rather than
+    with every agent that was ever simulated, and it is emitted at this size every emit step.
+    """
     def ports_schema(self):
         return {
             'time': {
@@ -64,5 +71,8 @@ class Logger(Deriver):
         time = states['time']
         log = {
             agent_id: (time, state['boundary']['death'])
-            for agent_id, state in source.items()}
+            for agent_id, state in source.items()
+            if state['boundary']['death']}
+        if not log:
+            return {}
         return {'log': log}
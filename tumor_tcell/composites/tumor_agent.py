@@ -16,7 +16,6 @@ import os
 # core imports
 from vivarium.core.composer import Composer, Composite
 from vivarium.core.engine import Engine
-from vivarium.plots.agents_multigen import plot_agents_multigen
 
 # processes
 from vivarium.processes.meta_division import MetaDivision
@@ -208,15 +207,10 @@ def test_tumor_agent(
 
     output = experiment.emitter.get_data()
 
-    # convert time to hours, and add agents key back in if all agents have died
-    times = list(output.keys())
-    for t in times:
-        if 'agents' not in output[t]:
-            output[t]['agents'] = {}
-        hr = t / 3600
-        output[hr] = output.pop(t)
-
-    return output
+    # add agents key back in if all agents have died, and convert time to hours in a new dict
+    for timepoint in output.values():
+        timepoint.setdefault('agents', {})
+    return {t / 3600: timepoint for t, timepoint in output.items()}
 
 
 def run_agent(out_dir='out'):
@@ -230,6 +224,7 @@ def run_agent(out_dir='out'):
     plot_settings = {
         'time_display': '(hr)'
     }
+    from vivarium.plots.agents_multigen import plot_agents_multigen
     plot_agents_multigen(data, plot_settings, out_dir)
 
 
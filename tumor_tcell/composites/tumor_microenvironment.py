@@ -26,9 +26,6 @@ from tumor_tcell.processes.neighbors import Neighbors
 from tumor_tcell.processes.fields import Fields
 from tumor_tcell.processes.lymph_node import LymphNode
 
-# plots
-from tumor_tcell.plots.snapshots import plot_snapshots, format_snapshot_data
-
 NAME = 'tumor_microenvironment'
 DEFAULT_BOUNDS = [50 * units.um, 50 * units.um]
 
@@ -314,6 +311,8 @@ def main():
         n_agents=1,
         end_time=6)
 
+    from tumor_tcell.plots.snapshots import plot_snapshots, format_snapshot_data
+
     # snapshot plot
     agents, fields = format_snapshot_data(data)
     plot_snapshots(
@@ -44,20 +44,17 @@ def run_analysis(data, experiment_id='tumor_tcell', sim_config={}):
     data = deserialize_value(data)
     data = remove_units(data)
 
-    # Convert seconds to hours
-    times = list(data.keys())
-    for time in times:
-        hour = time / 3600
-        data[hour] = data.pop(time)
+    # Convert seconds to hours, in a new dict rather than popping and reinserting each time
+    data = {time / 3600: time_data for time, time_data in data.items()}
 
     data_export = open(experiment_out_dir+'/data_export.pkl', 'wb')
-    pickle.dump(data, data_export)
+    pickle.dump(data, data_export, protocol=pickle.HIGHEST_PROTOCOL)
     data_export.close()
 
     sim_description = sim_config['description']
 
     config_export = open(experiment_out_dir + '/config_export.pkl', 'wb')
-    pickle.dump(sim_description, config_export)
+    pickle.dump(sim_description, config_export, protocol=pickle.HIGHEST_PROTOCOL)
     config_export.close()
 
     print('saved '+str(data_export))
@@ -6,7 +6,7 @@ import pandas as pd
 import os
 
 #Experiment tumor-tcell modules needed
-from tumor_tcell.experiments.main import (tumor_tcell_abm, plots_suite, get_tcells, get_tumors)
+from tumor_tcell.experiments.main import (run_sweep, plots_suite, get_tcells, get_tumors)
 from vivarium.library.units import units, remove_units
 
 #Analysis tumor-tcell modules needed
@@ -42,100 +42,80 @@ def killing_experiment(
             os.makedirs(exp_dir, exist_ok=True)
 
 
-        ##Experiment to compare to killing data 1:1 with 0 PDL1+ tumors
         N_TUMORS = N_cells
         N_TCELLS = int(N_cells/tumor_t_ratio)
         relative_pd1n = 0.25
-        relative_pdl1n = 1
-        DEFAULT_TUMORS = get_tumors(number=N_TUMORS, relative_pdl1n=relative_pdl1n)
-        DEFAULT_TCELLS = get_tcells(number=N_TCELLS, relative_pd1n=relative_pd1n)
 
         # global parameters
         TIMESTEP = 60
         BOUNDS = bounds
-        data = tumor_tcell_abm(
-            total_time=total_time,
-            tumors=DEFAULT_TUMORS,
-            tcells=DEFAULT_TCELLS,
-            halt_threshold=500,
-            emit_step=60,
-            bounds=BOUNDS,
-            sim_step=10 * TIMESTEP,
-        )
-        data = remove_units(data)
+        run_config = {
+            'total_time': total_time,
+            'halt_threshold': 500,
+            'emit_step': 60,
+            'bounds': BOUNDS,
+            'sim_step': 10 * TIMESTEP,
+        }
+
+        # the four simulations are independent, so they run together with run_sweep
+        data_1, data_2, data_3, data_4 = run_sweep([
+            ##Experiment to compare to killing data 1:1 with 0 PDL1+ tumors
+            {
+                **run_config,
+                'tumors': get_tumors(number=N_TUMORS, relative_pdl1n=1),
+                'tcells': get_tcells(number=N_TCELLS, relative_pd1n=relative_pd1n),
+            },
+            ##Experiment to compare to killing data 1:1 with 50% PDL1+ tumors
+            {
+                **run_config,
+                'tumors': get_tumors(number=N_TUMORS, relative_pdl1n=0.5),
+                'tcells': get_tcells(number=N_TCELLS, relative_pd1n=relative_pd1n),
+            },
+            ##Experiment to compare to killing data 0:1 with 50% PDL1+ tumors
+            ##Control
+            {
+                **run_config,
+                'n_tumors': N_cells,
+                'n_tcells': 0,
+                'tumors_state_PDL1n': 0.5,
+                'tcells_state_PD1n': relative_pd1n,
+                'time_step': TIMESTEP,
+            },
+            ##Experiment to compare to killing data 0:1 with 0% PDL1+ tumors
+            ##Control
+            {
+                **run_config,
+                'n_tumors': N_cells,
+                'n_tcells': 0,
+                'tumors_state_PDL1n': 1,
+                'tcells_state_PD1n': relative_pd1n,
+                'time_step': TIMESTEP,
+            },
+        ])
 
         # Plot the data using tumor-tcell experiment notebook and save in current directory
+        data = remove_units(data_1)
         fig1, fig2, fig3 = plots_suite(data, out_dir=exp_out_dir_1, bounds=[b * units.um for b in BOUNDS])
 
         # Extract dataframes for plotting
         df_tumor_death_1, df_tcell_death_1, tumor_plot_1, tcell_plot_1 = data_to_dataframes(data)
 
-
-
-        ##Experiment to compare to killing data 1:1 with 50% PDL1+ tumors
-        relative_pdl1n = 0.5
-        DEFAULT_TUMORS = get_tumors(number=N_TUMORS, relative_pdl1n=relative_pdl1n)
-        DEFAULT_TCELLS = get_tcells(number=N_TCELLS, relative_pd1n=relative_pd1n)
-
-        data = tumor_tcell_abm(
-            total_time=total_time,
-            tumors=DEFAULT_TUMORS,
-            tcells=DEFAULT_TCELLS,
-            halt_threshold=500,
-            emit_step=60,
-            bounds=BOUNDS,
-            sim_step=10 * TIMESTEP,
-        )
-        data = remove_units(data)
-
         # Plot the data using tumor-tcell experiment notebook and save in current directory
+        data = remove_units(data_2)
         fig1, fig2, fig3 = plots_suite(data, out_dir=exp_out_dir_2, bounds=[b * units.um for b in BOUNDS])
 
         # Extract data for plotting
         df_tumor_death_2, df_tcell_death_2, tumor_plot_2, tcell_plot_2 = data_to_dataframes(data)
 
-
-
-        ##Experiment to compare to killing data 0:1 with 50% PDL1+ tumors
-        ##Control
-        data = tumor_tcell_abm(
-            bounds=BOUNDS,
-            n_tumors=N_cells,
-            n_tcells=0,
-            tumors_state_PDL1n=0.5,
-            tcells_state_PD1n=relative_pd1n,
-            total_time=total_time,
-            sim_step=10 * TIMESTEP,
-            halt_threshold=500,
-            time_step=TIMESTEP,
-            emit_step=60,
-        )
-        data = remove_units(data)
-
         # Plot the data using tumor-tcell experiment notebook and save in current directory
+        data = remove_units(data_3)
         fig1, fig2, fig3 = plots_suite(data, out_dir=exp_out_dir_3, bounds=[b * units.um for b in BOUNDS])
 
         # Extract data for plotting
         df_tumor_death_3, tumor_plot_3 = control_data_to_dataframes(data)
 
-
-
-        ##Experiment to compare to killing data 0:1 with 0% PDL1+ tumors
-        ##Control
-        data = tumor_tcell_abm(
-            bounds=BOUNDS,
-            n_tumors=N_cells,
-            n_tcells=0,
-            tumors_state_PDL1n=1,
-            tcells_state_PD1n=relative_pd1n,
-            total_time=total_time,
-            sim_step=10 * TIMESTEP,
-            halt_threshold=500,
-            time_step=TIMESTEP,
-            emit_step=60, )
-        data = remove_units(data)
-
         # Plot the data using tumor-tcell experiment notebook and save in current directory
+        data = remove_units(data_4)
         fig1, fig2, fig3 = plots_suite(data, out_dir=exp_out_dir_4, bounds=[b * units.um for b in BOUNDS])
 
         # Extract data for plotting
@@ -17,12 +17,18 @@ You can find information on the different workflows by reading the comments incl
 at the bottom of this file.
 """
 import copy
-import random
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 import time as clock
 from tqdm import tqdm
 import math
 import os
 import pickle
+import random
+import sys
+import numpy as np
 
 # vivarium-core imports
 from vivarium.core.engine import Engine, timestamp, pp
@@ -30,9 +36,6 @@ from vivarium.library.units import units, remove_units
 from vivarium.core.control import Control
 
 # plots
-from vivarium.plots.agents_multigen import plot_agents_multigen
-from tumor_tcell.plots.video import make_video
-from tumor_tcell.plots.snapshots import plot_snapshots, format_snapshot_data
 from vivarium.core.emitter import deserialize_value
 
 # tumor-tcell imports
@@ -44,7 +47,8 @@ from tumor_tcell.composites.tumor_microenvironment import (
     TumorAndLymphNodeEnvironment
 )
 from tumor_tcell.composites.death_logger import DeathLogger
-from tumor_tcell.library.location import random_location
+from tumor_tcell.library.location import random_locations
+from tumor_tcell.processes.fields import precompile_kernels
 
 # default parameters
 PI = math.pi
@@ -52,6 +56,17 @@ TIMESTEP = 60
 NBINS = [20, 20]
 DEPTH = 15  # um
 BOUNDS = [200 * units.um, 200 * units.um]
+PARALLEL_THRESHOLD = 32  # initial tumors + tcells at which the environment runs in parallel with parallel=None
+MAX_EMITS = 200  # most emits recorded over a simulation when emit_step is not given
+EXPERIMENT_DEFAULTS = {'display_info': False}  # Engine settings shared by every tumor_tcell_abm experiment
+
+# the cell sizes and speeds, made once so that the initial states share these Quantities
+TCELL_DIAMETER = 7.5 * units.um
+TCELL_VELOCITY = 10.0 * units.um / units.min
+TUMOR_DIAMETER = 15 * units.um
+TUMOR_VELOCITY = 0.0 * units.um / units.min
+DENDRITIC_DIAMETER = 10.0 * units.um  # TODO - this should not be required
+DENDRITIC_VELOCITY = 3.0 * units.um / units.min
 
 TUMOR_ID = 'tumor'
 TCELL_ID = 'tcell'
@@ -60,6 +75,16 @@ TUMOR_ENV_ID = 'tumor_environment'
 LN_ID = 'lymph_node'
 TRANSIT_ID = 'in_transit'
 
+# agent ids are made as f'{TYPE_ID}_{n}', and daughters append to the mother's id
+AGENT_ID_PREFIXES = {
+    TCELL_ID: f'{TCELL_ID}_',
+    TUMOR_ID: f'{TUMOR_ID}_',
+    DENDRITIC_ID: f'{DENDRITIC_ID}_',
+}
+# int8 codes for the agent types, used to partition agents with numpy masks. -1 is for unknown ids
+AGENT_TYPE_CODES = {agent_type: code for code, agent_type in enumerate(AGENT_ID_PREFIXES)}
+UNKNOWN_AGENT_CODE = -1
+
 # parameters for toy experiments
 MEDIUM_BOUNDS = [90 * units.um, 90 * units.um]
 
@@ -79,96 +104,266 @@ def get_tcells(
         relative_pd1n=0.2,
         total_pd1n=None,
         added_identifier='',
+        rng=None,
 ):
     """
     make an initial state for any number of tcell instances,
     with either PD1 negative (`PD1n`) or PD1 positive (`PD1p`) states determined by the parameter
-    `relative_pd1n` or `total_pd1n`.
+    `relative_pd1n` or `total_pd1n`. The random values for all tcells are drawn at once with numpy,
+    from the random generator `rng` or from numpy's global random state if it is None,
+    and each tcell's state copies a template with the values that are shared by all tcells.
     """
+    rng = np.random if rng is None else rng
     if total_pd1n:
         assert isinstance(total_pd1n, int)
-        return {
-            f'{TCELL_ID}{added_identifier}_{n}': {
-                'type': 'tcell',
-                'cell_state': 'PD1n' if n < total_pd1n else 'PD1p',
-                'TCR_timer': random.uniform(0, 5400),
-                'velocity_timer': 0,
-                'velocity': 10.0 * units.um / units.min,
-                'diameter': 7.5 * units.um,
-            } for n in range(number)}
+        pd1n = np.arange(number) < total_pd1n
     else:
         assert relative_pd1n <= 1.0
-        return {
-            f'{TCELL_ID}{added_identifier}_{n}': {
-                'type': 'tcell',
-                'cell_state': 'PD1n' if random.uniform(0, 1) < relative_pd1n else 'PD1p',
-                'TCR_timer': random.uniform(0, 5400),
-                'velocity_timer': 0,
-                'velocity': 10.0 * units.um / units.min,
-                'diameter': 7.5 * units.um,
-            } for n in range(number)}
+        pd1n = rng.random(number) < relative_pd1n
+    tcr_timers = rng.uniform(0, 5400, number)
+    template = {
+        'type': 'tcell',
+        'velocity_timer': 0,
+        'velocity': TCELL_VELOCITY,
+        'diameter': TCELL_DIAMETER,
+    }
+    return {
+        f'{TCELL_ID}{added_identifier}_{n}': dict(
+            template,
+            cell_state='PD1n' if is_pd1n else 'PD1p',
+            TCR_timer=tcr_timer,
+        ) for n, (is_pd1n, tcr_timer) in enumerate(zip(pd1n.tolist(), tcr_timers.tolist()))}
 
 
-def get_tumors(number=1, relative_pdl1n=0.5):
+def get_tumors(number=1, relative_pdl1n=0.5, rng=None):
     """
     make an initial state for any number of tumor instances,
     with either PD1 negative (`PDL1n`) or PD1 positive (`PDL1p`) states determined by the parameter
-    `relative_pdl1n`
+    `relative_pdl1n`. The states for all tumors are drawn in a single call to the numpy random
+    generator `rng`, or to numpy's global random state if it is None, which can be seeded with
+    `np.random.seed` for reproducible initial states.
     """
+    rng = np.random if rng is None else rng
+    pdl1n = rng.random(number) < relative_pdl1n
+    template = {
+        'type': 'tumor',
+        'diameter': TUMOR_DIAMETER,
+    }
+    return {
+        f'{TUMOR_ID}_{n}': dict(
+            template,
+            cell_state='PDL1n' if is_pdl1n else 'PDL1p',
+        ) for n, is_pdl1n in enumerate(pdl1n.tolist())}
+
+
+def get_dendritic(number=1, dendritic_state_active=0.0, rng=None):
+    rng = np.random if rng is None else rng
+    active = rng.random(number) < dendritic_state_active
+    template = {
+        'type': 'dendritic',
+        'diameter': DENDRITIC_DIAMETER,
+    }
     return {
-        '{}_{}'.format(TUMOR_ID, n): {
-            'type': 'tumor',
-            'cell_state': 'PDL1n' if random.uniform(0, 1) < relative_pdl1n else 'PDL1p',
-            'diameter': 15 * units.um,
-        } for n in range(number)}
+        f'{DENDRITIC_ID}_{n}': dict(
+            template,
+            cell_state='active' if is_active else 'inactive',
+        ) for n, is_active in enumerate(active.tolist())}
 
 
-def get_dendritic(number=1, dendritic_state_active=0.0):
-    return {
-        '{}_{}'.format(DENDRITIC_ID, n): {
-            'type': 'dendritic',
-            'cell_state': 'active' if random.uniform(0, 1) < dendritic_state_active else 'inactive',
-            'diameter': 10.0 * units.um,  # TODO -- don't hardcode this!
-        } for n in range(number)}
+@contextmanager
+def seeded_random_states(seed=None):
+    """
+    seed the `random` and numpy global random states with `seed` inside the context, and restore the
+    states they had before when it exits. If `seed` is None, the random states are left as they are.
+
+    >>> with seeded_random_states(0):
+    ...     first = random.random(), np.random.random()
+    >>> with seeded_random_states(0):
+    ...     second = random.random(), np.random.random()
+    >>> first == second
+    True
+    """
+    if seed is None:
+        yield
+        return
+    random_state, np_random_state = random.getstate(), np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(np_random_state)
 
 
 def convert_to_hours(data):
-    """Convert seconds to hours"""
-    times = list(data.keys())
-    for time in times:
-        hour = time / 3600
-        data[hour] = data.pop(time)
-    return data
+    """
+    Convert the times of `data` from seconds to hours. A new dict is built in one pass, which
+    shares the data of each time point, rather than popping and reinserting every key of `data`.
+    """
+    return {time / 3600: time_data for time, time_data in data.items()}
 
 
-# make defaults
+# make defaults. The default agents are made when they are first requested, rather than at import
 N_TUMORS = 120
 N_TCELLS = 9
-DEFAULT_TUMORS = get_tumors(number=N_TUMORS)
-DEFAULT_TCELLS = get_tcells(number=N_TCELLS)
+
+
+@lru_cache(maxsize=1)
+def default_tumors():
+    """the initial state of N_TUMORS tumors from `get_tumors`, made once and shared by the callers"""
+    return get_tumors(number=N_TUMORS)
+
+
+@lru_cache(maxsize=1)
+def default_tcells():
+    """the initial state of N_TCELLS t cells from `get_tcells`, made once and shared by the callers"""
+    return get_tcells(number=N_TCELLS)
+
+
+# default values for the initial agent states, used for the values that an agent's state does not set
+TCELL_DEFAULTS = {
+    'cell_state': None,
+    'diameter': TCELL_DIAMETER,
+    'velocity': TCELL_VELOCITY,
+    'velocity_timer': 0,
+    'TCR_timer': 0,
+    'PD1': None,
+    'TCR': 50000,
+}
+TUMOR_DEFAULTS = {
+    'cell_state': None,
+    'diameter': TUMOR_DIAMETER,
+    'velocity': TUMOR_VELOCITY,
+    'PDL1': None,
+    'MHCI': 1000,
+}
+DENDRITIC_DEFAULTS = {
+    'cell_state': None,
+    'diameter': DENDRITIC_DIAMETER,
+    'velocity': DENDRITIC_VELOCITY,
+}
+
+
+def initial_tcell_state(state, location):
+    """make the initial state of a tcell agent at `location`, with `TCELL_DEFAULTS` for unset values"""
+    state = {**TCELL_DEFAULTS, **state}
+    return {
+        'boundary': {
+            'cell_type': 't-cell',
+            'location': location,
+            'diameter': state['diameter'],
+            'velocity': state['velocity']},
+        'internal': {
+            'cell_state': state['cell_state'],
+            'velocity_timer': state['velocity_timer'],
+            'TCR_timer': state['TCR_timer']},
+        'neighbors': {
+            'present': {
+                'PD1': state['PD1'],
+                'TCR': state['TCR']}
+        }}
+
+
+def initial_tumor_state(state, location):
+    """make the initial state of a tumor agent at `location`, with `TUMOR_DEFAULTS` for unset values"""
+    state = {**TUMOR_DEFAULTS, **state}
+    return {
+        'internal': {
+            'cell_state': state['cell_state']},
+        'boundary': {
+            'cell_type': 'tumor',
+            'location': location,
+            'diameter': state['diameter'],
+            'velocity': state['velocity']},
+        'neighbors': {
+            'present': {
+                'PDL1': state['PDL1'],
+                'MHCI': state['MHCI']}
+        }}
+
+
+def initial_dendritic_state(state, location):
+    """make the initial state of a dendritic cell agent at `location`, with `DENDRITIC_DEFAULTS` for unset values"""
+    state = {**DENDRITIC_DEFAULTS, **state}
+    return {
+        'internal': {
+            'cell_state': state['cell_state']},
+        'boundary': {
+            'cell_type': 'dendritic',
+            'location': location,
+            'diameter': state['diameter'],
+            'velocity': state['velocity']},
+    }
 
 
 def fill_initial_cell_state(state):
+    state = {**TCELL_DEFAULTS, 'PD1': 0, **state}
     return {
         'boundary': {
             'cell_type': 't-cell',
-            'diameter': state.get('diameter', 7.5 * units.um),
-            'velocity': state.get('velocity', 10.0 * units.um / units.min),
+            'diameter': state['diameter'],
+            'velocity': state['velocity'],
         },
         'internal': {
-            'cell_state': state.get('cell_state', None),
-            'velocity_timer': state.get('velocity_timer', 0),
-            'TCR_timer': state.get('TCR_timer', 0)
+            'cell_state': state['cell_state'],
+            'velocity_timer': state['velocity_timer'],
+            'TCR_timer': state['TCR_timer']
         },
         'neighbors': {
             'present': {
-                'PD1': state.get('PD1', 0),
-                'TCR': state.get('TCR', 50000)
+                'PD1': state['PD1'],
+                'TCR': state['TCR']
             }
         }
     }
 
 
+def max_diameter(agents, default):
+    """
+    the largest diameter of the states in `agents`, where states without a diameter have the `default`
+    diameter of their type. This is the distance that keeps the agents' random locations apart.
+
+    >>> max_diameter({'tcell_0': {}, 'tcell_1': {'diameter': 9.0}}, 7.5)
+    9.0
+    >>> max_diameter({}, 7.5)
+    7.5
+    """
+    return max((state.get('diameter', default) for state in agents.values()), default=default)
+
+
+def get_locations(agents, bounds, **kwargs):
+    """
+    get the location of each agent in `agents`. Agents that do not specify a location get a random
+    location from `random_locations`, which are drawn together. kwargs are passed to `random_locations`.
+    """
+    missing_ids = [agent_id for agent_id, state in agents.items() if 'location' not in state]
+    new_locations = dict(zip(missing_ids, random_locations(len(missing_ids), bounds, **kwargs)))
+    return {
+        agent_id: state['location'] if 'location' in state else new_locations[agent_id]
+        for agent_id, state in agents.items()}
+
+
+def add_agents(composite_model, composer, agent_ids, region_id):
+    """
+    generate an agent composite for each id in `agent_ids` and merge them into `composite_model`
+    under the agents store of `region_id`. All agents share the composer's configuration,
+    and only the `agent_id` is set for each one.
+
+    The agents' processes, steps, flow, and topology are collected in plain dicts under their ids,
+    and merged into the full model once. Each `Composite.merge` copies all of the processes that
+    the composite already has, so merging agents one at a time would take quadratic time.
+    """
+    agents = {'processes': {}, 'steps': {}, 'flow': {}, 'topology': {}}
+    for agent_id in agent_ids:
+        agent = composer.generate({'agent_id': agent_id})
+        for key, agents_values in agents.items():
+            agents_values[agent_id] = agent[key]
+    if not agents['processes']:
+        return
+    composite_model.merge(path=(region_id, 'agents'), **agents)
+
+
 # The main simulation function
 def tumor_tcell_abm(
         bounds=None,
@@ -190,7 +385,7 @@ def tumor_tcell_abm(
         sim_step=10 * TIMESTEP,  # simulation increments at which halt_threshold is checked
         halt_threshold=300,  # stop simulation at this number
         time_step=TIMESTEP,
-        emit_step=10 * TIMESTEP,
+        emit_step=None,
         emitter='timeseries',
         parallel=False,
         tumors_distance=None,
@@ -199,7 +394,10 @@ def tumor_tcell_abm(
         tcells_excluded_distance=None,
         tumors_center=None,
         tcell_center=None,
+        separate_initial_cells=True,
         lymph_nodes=False,
+        seed=None,
+        unitless=False,
         return_experiment=False,
 ):
     """ Tumor-Tcell simulation
@@ -226,9 +424,20 @@ def tumor_tcell_abm(
     * sim_step (float): length of simulation increments which check if halt_threshold has been reached.
     * halt_threshold (int): if the total number of cells reaches this value, the simulaiton is terminated.
     * time_step (float): the time step used for the tcell agents, tumor agents, and microenvironment.
-    * emit_step (int): the number of time steps between saving simulation state.
-    * emitter (str): the type of emitter, choose between "timeseries" and "database".
-    * parallel (bool): whether simulations run with parallel processes.
+    * emit_step (int): the time between saving simulation state, in seconds. If None, it is the
+        larger of sim_step and total_time / MAX_EMITS (rounded down to a multiple of time_step), so that
+        memory and plotting time do not grow with total_time. Pass emit_step=time_step to save every step.
+    * emitter (str): the type of emitter, choose between "timeseries", "array", "parquet", "delta",
+        "database" and "buffered_database". "array" keeps the agents in a columnar layout, "parquet" writes
+        agent trajectories to disk, "delta" keeps only the agent variables that change between emits, and
+        "buffered_database" writes to the database in batches from a background thread
+        (see tumor_tcell.library.emitters). The "parquet" data only has the agents' location, diameter
+        and cell_state, with float32 positions, so it can be used for snapshots and videos but not for
+        plots_suite's multigen plots or data_process.data_to_dataframes, which read the other variables.
+    * parallel (bool): whether simulations run with parallel processes. If None, the environment
+        processes (physics and diffusion) run in parallel when the initial tumors and tcells
+        reach PARALLEL_THRESHOLD, and the agent processes run in the main process. By default,
+        all processes run in the main process.
     * tumors_distance (float): if this is set, is places tumors within this distance from tumors_excluded_distance.
     * tcells_distance: if this is set, is places tcells within this distance from tcells_excluded_distance.
     * tumors_excluded_distance (float): if this is set, it excludes tumors within this distance from the center,
@@ -237,14 +446,38 @@ def tumor_tcell_abm(
         which together with tcells_distance supports ring-like structures.
     * tumors_center (list): [x, y] position for the center of the tumors.
     * tcell_center (list): [x, y] position for the center of the tcells.
+    * separate_initial_cells (bool): whether the random initial locations of each cell type are redrawn
+        where cells of that type overlap, so the physics does not start by pushing them apart. The cells
+        are kept apart by the largest diameter of their type, including the diameters of given tcells
+        and tumors. Overlaps remain where the cells are too packed to be separated. The redraws make the
+        locations slightly more even than the uniform disk or ring they are drawn from.
     * lymph_nodes (bool): sets whether tcells have a lymph node location, and sets behavior of the mother cells
         to not migrate.
+    * seed (int): seeds a numpy random generator for the initial cell states and locations, and seeds
+        the `random` and numpy global random states that the processes draw from during the simulation,
+        so that runs with the same seed are reproducible. The global random states are restored when the
+        simulation ends, so the caller's later draws are not affected. Subprocesses of parallel runs keep
+        their own random states, so only serial runs are fully reproducible. If None, the initial states
+        are drawn from numpy's global random state, and no random state is seeded.
+    * unitless (bool): whether the returned data has its units stripped, with values as plain numbers
+        in the units they were emitted in. The emitted values are read straight to their magnitudes,
+        so plots and analyses do not walk the data again with remove_units. By default, the data
+        keeps its units as Quantities.
 
     Return:
         Simulation output data (dict)
     """
     bounds = bounds or BOUNDS
     n_bins = n_bins or NBINS
+    rng = np.random.default_rng(seed) if seed is not None else None
+
+    # the environment processes are the expensive ones, and only add two subprocesses, while
+    # parallel agents would add a subprocess for every process of every agent
+    n_initial_cells = (len(tumors) if tumors else n_tumors) + (len(tcells) if tcells else n_tcells)
+    parallel_environment = parallel if parallel is not None else n_initial_cells >= PARALLEL_THRESHOLD
+    parallel = bool(parallel)
+    if emit_step is None:
+        emit_step = max(sim_step, time_step * (total_time // (time_step * MAX_EMITS)))
 
     ############################
     # Create the configuration #
@@ -273,11 +506,11 @@ def tumor_tcell_abm(
     ## Environment composer
     environment_config = {
         'neighbors_multibody': {
-            '_parallel': parallel,
+            '_parallel': parallel_environment,
             'time_step': time_step,
             'bounds': bounds},
         'diffusion_field': {
-            '_parallel': parallel,
+            '_parallel': parallel_environment,
             'time_step': time_step,
             'molecules': field_molecules,
             'bounds': bounds,
@@ -304,190 +537,159 @@ def tumor_tcell_abm(
     logger = logger_composer.generate()
     composite_model.merge(composite=logger, path=(TUMOR_ENV_ID,))
 
+    # make the initial environment state before the agents are added. The agents' initial
+    # states are all set below, so computing them from each agent's processes would be discarded work.
+    initial_env_config = {
+        TUMOR_ENV_ID: {
+            'diffusion_field': {'uniform': 0.0}}}
+    initial_state = composite_model.initial_state(initial_env_config)
+
     # Make the cells
     tcells_lymph_node = {}
     if not tcells:
         tcells = get_tcells(
             number=n_tcells,
             relative_pd1n=tcells_state_PD1n,
-            total_pd1n=tcells_total_PD1n)
+            total_pd1n=tcells_total_PD1n,
+            rng=rng)
         if lymph_nodes:
             tcells_lymph_node = get_tcells(
                 number=n_tcells_lymph_node,
                 relative_pd1n=1.0,
-                added_identifier='_LN'
+                added_identifier='_LN',
+                rng=rng,
             )
     if not tumors:
         tumors = get_tumors(
             number=n_tumors,
-            relative_pdl1n=tumors_state_PDL1n)
+            relative_pdl1n=tumors_state_PDL1n,
+            rng=rng)
     if not dendritic_cells:
         dendritic_cells = get_dendritic(
-            number=n_dendritic, dendritic_state_active=dendritic_state_active)
+            number=n_dendritic, dendritic_state_active=dendritic_state_active, rng=rng)
 
-    # add T cells to the composite
-    for agent_id in tcells.keys():
-        t_cell = t_cell_composer.generate({'agent_id': agent_id})
-        composite_model.merge(composite=t_cell, path=(TUMOR_ENV_ID, 'agents', agent_id))
-
-    # add tumors to the composite
-    for agent_id in tumors.keys():
-        tumor = tumor_composer.generate({'agent_id': agent_id})
-        composite_model.merge(composite=tumor, path=(TUMOR_ENV_ID, 'agents', agent_id))
+    # add T cells and tumors to the composite
+    add_agents(composite_model, t_cell_composer, tcells.keys(), TUMOR_ENV_ID)
+    add_agents(composite_model, tumor_composer, tumors.keys(), TUMOR_ENV_ID)
     if lymph_nodes:
         # add dendritic cells to the composite
-        for agent_id in dendritic_cells.keys():
-            dendritic = dendritic_composer.generate({'agent_id': agent_id})
-            composite_model.merge(composite=dendritic, path=(TUMOR_ENV_ID, 'agents', agent_id))
-
-        # add lymph node T cells
-        for index, agent_id in enumerate(tcells_lymph_node.keys()):
-            t_cell = t_cell_composer.generate({'agent_id': agent_id})
-            if index == 0:  # put first one in transit
-                composite_model.merge(composite=t_cell, path=(TRANSIT_ID, 'agents', agent_id))
-            else:  # the rest go in the lymph node
-                composite_model.merge(composite=t_cell, path=(LN_ID, 'agents', agent_id))
+        add_agents(composite_model, dendritic_composer, dendritic_cells.keys(), TUMOR_ENV_ID)
+
+        # add lymph node T cells, the first one goes in transit and the rest go in the lymph node
+        lymph_node_ids = list(tcells_lymph_node.keys())
+        add_agents(composite_model, t_cell_composer, lymph_node_ids[:1], TRANSIT_ID)
+        add_agents(composite_model, t_cell_composer, lymph_node_ids[1:], LN_ID)
 
     ###################################
     # Initialize the simulation state #
     ####################################
 
-    # make the initial environment state
-    initial_env_config = {
-        TUMOR_ENV_ID: {
-            'diffusion_field': {'uniform': 0.0}}}
-    initial_state = composite_model.initial_state(initial_env_config)
-
-    # initialize cell states
-    initial_t_cells = {
-        agent_id: {
-            'boundary': {
-                'cell_type': 't-cell',
-                'location': state.get('location', random_location(
-                    bounds,
-                    center=tcell_center,
-                    distance_from_center=tcells_distance,
-                    excluded_distance_from_center=tcells_excluded_distance,
-                )),
-                'diameter': state.get('diameter', 7.5 * units.um),
-                'velocity': state.get('velocity', 10.0 * units.um / units.min)},
-            'internal': {
-                'cell_state': state.get('cell_state', None),
-                'velocity_timer': state.get('velocity_timer', 0),
-                'TCR_timer': state.get('TCR_timer', 0)},
-            'neighbors': {
-                'present': {
-                    'PD1': state.get('PD1', None),
-                    'TCR': state.get('TCR', 50000)}
-            }} for agent_id, state in tcells.items()}
-
-    initial_tumors = {
-        agent_id: {
-            'internal': {
-                'cell_state': state.get('cell_state', None)},
-            'boundary': {
-                'cell_type': 'tumor',
-                'location': state.get('location', random_location(
-                    bounds,
-                    center=tumors_center,
-                    distance_from_center=tumors_distance,
-                    excluded_distance_from_center=tumors_excluded_distance)),
-                'diameter': state.get('diameter', 15 * units.um),
-                'velocity': state.get('velocity', 0.0 * units.um / units.min)},
-            'neighbors': {
-                'present': {
-                    'PDL1': state.get('PDL1', None),
-                    'MHCI': state.get('MHCI', 1000)}
-            }} for agent_id, state in tumors.items()}
-
-    initial_dendritic = {
-        agent_id: {
-            'internal': {
-                'cell_state': state.get('cell_state', None)},
-            'boundary': {
-                'cell_type': 'dendritic',
-                'location': state.get('location', random_location(
-                    bounds,
-                    center=tumors_center,
-                    distance_from_center=tumors_distance,
-                    excluded_distance_from_center=tumors_excluded_distance)),
-                'diameter': state.get('diameter', 10 * units.um),  # TODO - this should not be required
-                'velocity': state.get('velocity', 3.0 * units.um / units.min)
-            },
-        } for agent_id, state in dendritic_cells.items()}
-
-    # combine all the initial states together under the tumor environment
-    initial_state[TUMOR_ENV_ID]['agents'].update({
-        **initial_t_cells,
-        **initial_tumors,
-        **initial_dendritic
-    })
+    # initialize cell states. These are handed to vivarium's stores, which require nested dicts.
+    # Default locations are only generated for cells that do not specify their own.
+    tcell_locations = get_locations(
+        tcells, bounds,
+        center=tcell_center,
+        distance_from_center=tcells_distance,
+        excluded_distance_from_center=tcells_excluded_distance,
+        min_distance=max_diameter(tcells, TCELL_DIAMETER) if separate_initial_cells else None,
+        rng=rng)
+    tumor_locations = get_locations(
+        tumors, bounds,
+        center=tumors_center,
+        distance_from_center=tumors_distance,
+        excluded_distance_from_center=tumors_excluded_distance,
+        min_distance=max_diameter(tumors, TUMOR_DIAMETER) if separate_initial_cells else None,
+        rng=rng)
+    dendritic_locations = get_locations(
+        dendritic_cells, bounds,
+        center=tumors_center,
+        distance_from_center=tumors_distance,
+        excluded_distance_from_center=tumors_excluded_distance,
+        min_distance=max_diameter(dendritic_cells, DENDRITIC_DIAMETER) if separate_initial_cells else None,
+        rng=rng)
+
+    # build all the initial states directly under the tumor environment's agents, in one pass per type
+    initial_agents = initial_state[TUMOR_ENV_ID].setdefault('agents', {})
+    for agent_id, state in tcells.items():
+        initial_agents[agent_id] = initial_tcell_state(state, tcell_locations[agent_id])
+    for agent_id, state in tumors.items():
+        initial_agents[agent_id] = initial_tumor_state(state, tumor_locations[agent_id])
+    for agent_id, state in dendritic_cells.items():
+        initial_agents[agent_id] = initial_dendritic_state(state, dendritic_locations[agent_id])
 
     if lymph_nodes:
-        initial_t_cells_transit = {}
-        initial_t_cells_ln = {}
-
-        # fill initial state for cells in lymph node and in transit
-        for region in [LN_ID, TRANSIT_ID]:
-            if region == LN_ID:
-                for agent_id in composite_model['processes']['lymph_node']['agents'].keys():
-                    config = {}
-                    initial_t_cells_ln[agent_id] = fill_initial_cell_state(config)
-            elif region == TRANSIT_ID:
-                for agent_id, state in composite_model['processes']['in_transit']['agents'].items():
-                    config = {'cell_state': 'PD1n'}
-                    initial_t_cells_transit[agent_id] = fill_initial_cell_state(config)
-
+        # fill initial state for cells in lymph node and in transit, from the ids they were added with.
         # the tumor environment gets nested alongside the lymph node
-        initial_state[LN_ID] = {'agents': initial_t_cells_ln}
-        initial_state[TRANSIT_ID] = {'agents': initial_t_cells_transit}
+        initial_state[LN_ID] = {'agents': {
+            agent_id: fill_initial_cell_state({})
+            for agent_id in lymph_node_ids[1:]}}
+        initial_state[TRANSIT_ID] = {'agents': {
+            agent_id: fill_initial_cell_state({'cell_state': 'PD1n'})
+            for agent_id in lymph_node_ids[:1]}}
 
     ######################
     # Run the simulation #
     ######################
 
     experiment_id = (f"tumor_tcell_{timestamp()}")
-    experiment_config = {
-        'description': f"n_tcells: {n_tcells} \n"
-                       f"n_tumors: {n_tumors} \n"
-                       f"tumors_state_PDL1n: {tumors_state_PDL1n} \n"
-                       f"tcells_state_PD1n:{tcells_state_PD1n} \n"
-                       f"tcells_total_PD1n:{tcells_total_PD1n} \n"
-                       f"total_time:{total_time} \n"
-                       f"time_step:{time_step} \n"
-                       f"sim_step:{sim_step} \n"
-                       f"bounds:{bounds} \n"
-                       f"n_bins:{n_bins} \n"
-                       f"halt_threshold:{halt_threshold} \n"
-                       f"tumors_distance:{tumors_distance} \n"
-                       f"tcells_distance: {tcells_distance} \n",
-        'processes': composite_model.processes,
-        'topology': composite_model.topology,
-        'initial_state': initial_state,
-        'display_info': False,
-        'experiment_id': experiment_id,
-        'emit_step': emit_step,
-        'emitter': {'type': emitter}}
+    experiment_config = dict(
+        EXPERIMENT_DEFAULTS,
+        description=f"n_tcells: {n_tcells} \n"
+                    f"n_tumors: {n_tumors} \n"
+                    f"tumors_state_PDL1n: {tumors_state_PDL1n} \n"
+                    f"tcells_state_PD1n:{tcells_state_PD1n} \n"
+                    f"tcells_total_PD1n:{tcells_total_PD1n} \n"
+                    f"total_time:{total_time} \n"
+                    f"time_step:{time_step} \n"
+                    f"sim_step:{sim_step} \n"
+                    f"bounds:{bounds} \n"
+                    f"n_bins:{n_bins} \n"
+                    f"halt_threshold:{halt_threshold} \n"
+                    f"tumors_distance:{tumors_distance} \n"
+                    f"tcells_distance: {tcells_distance} \n",
+        processes=composite_model.processes,
+        topology=composite_model.topology,
+        initial_state=initial_state,
+        experiment_id=experiment_id,
+        emit_step=emit_step,
+        emitter={'type': emitter})
+    # importing the emitters registers the "array", "parquet", "delta" and "buffered_database" emitters
+    from tumor_tcell.library import emitters
     print(f'Initializing experiment {experiment_id}')
-    experiment = Engine(**experiment_config)
-
-    # run simulation and terminate upon reaching total_time or halt_threshold
-    clock_start = clock.time()
-    for time in tqdm(range(0, total_time, sim_step)):
-        n_agents = len(experiment.state.get_value()[TUMOR_ENV_ID]['agents'])
-        if n_agents < halt_threshold:
-            experiment.update(sim_step)
-        else:
-            print(f'halt threshold of {halt_threshold} reached at time = {time}')
-            continue
-
-    # print runtime and finalize
-    clock_finish = clock.time() - clock_start
-    print('Completed in {:.2f} seconds'.format(clock_finish))
-    experiment.end()
+    # the processes draw from the `random` and numpy global random states, which are seeded for the
+    # simulation and restored once it ends
+    with seeded_random_states(seed):
+        experiment = Engine(**experiment_config)
+
+        # run simulation and terminate upon reaching total_time or halt_threshold.
+        # agents are counted from the children of their store, without getting the value of the whole state.
+        # the last increment is shortened if needed, so the simulation does not run past total_time.
+        # the progress bar refreshes at most once a second, and is off when stderr is not a terminal, as in logs
+        agents_store = experiment.state.get_path((TUMOR_ENV_ID, 'agents'))
+        clock_start = clock.time()
+        for time in tqdm(range(0, total_time, sim_step), mininterval=1.0, disable=not sys.stderr.isatty()):
+            n_agents = len(agents_store.inner)
+            if n_agents < halt_threshold:
+                experiment.update(min(sim_step, total_time - time))
+            else:
+                print(f'halt threshold of {halt_threshold} reached at time = {time}')
+                break
+
+        # print runtime and finalize
+        clock_finish = clock.time() - clock_start
+        print('Completed in {:.2f} seconds'.format(clock_finish))
+        experiment.end()
+
+    # emitters that write in the background, such as "buffered_database", finish their writes here,
+    # so that their whole history can be read elsewhere
+    if hasattr(experiment.emitter, 'close'):
+        experiment.emitter.close()
 
     # return the data
-    data = experiment.emitter.get_data_deserialized()
+    if unitless:
+        data = emitters.deserialize_unitless(experiment.emitter.get_data())
+    else:
+        data = experiment.emitter.get_data_deserialized()
     data = convert_to_hours(data)
     if return_experiment:
         return data, experiment
@@ -512,11 +714,16 @@ def large_experiment(
         tcells_distance=250 * units.um,  # in or out (None) of the tumor
         tcells_excluded_distance=240 * units.um,  # for creating a ring around tumor
         field_molecules=None,
+        parallel=False,
         return_experiment=False,
 ):
     """
     Configurable large environment that has many tumors and t cells. Calls tumor_tcell_abm
     with a few key parameters.
+
+    With `parallel=None`, the environment processes (physics and diffusion) run in parallel,
+    since the initial cells exceed PARALLEL_THRESHOLD. `parallel=True` also runs every agent
+    process in its own subprocess, which only pays off with a core for each of them.
     """
     if field_molecules is None:
         field_molecules = ['IFNg']
@@ -542,6 +749,7 @@ def large_experiment(
         tcells_excluded_distance=tcells_excluded_distance,  # for creating a ring around tumor
         lymph_nodes=lymph_nodes,
         field_molecules=field_molecules,
+        parallel=parallel,
         return_experiment=return_experiment,
     )
 
@@ -583,6 +791,94 @@ def lymph_node_experiment():
     )
 
 
+def _run_sweep_config(config):
+    """run one simulation of `run_sweep` in a worker process"""
+    return tumor_tcell_abm(**config)
+
+
+def run_sweep(configs, workers=None):
+    """
+    run tumor_tcell_abm with each of `configs`, which are dicts of its keyword arguments, and return
+    the output data of each simulation in the same order.
+
+    The simulations are independent, so they run in `workers` processes, one per core by default.
+    Each simulation runs its processes serially (parallel=False), so the workers do not start
+    subprocesses of their own. Forked workers start with copies of the parent's random states, so
+    configs without a seed get a distinct seed from a fresh `np.random.SeedSequence`, and the
+    simulations do not repeat each other's random draws.
+    """
+    seeds = np.random.SeedSequence().generate_state(len(configs)).tolist()
+    configs = [
+        {**config, 'seed': seed if config.get('seed') is None else config['seed'], 'parallel': False}
+        for config, seed in zip(configs, seeds)]
+    if workers is None:
+        workers = min(len(configs), os.cpu_count())
+    if workers <= 1:
+        return [tumor_tcell_abm(**config) for config in configs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_sweep_config, configs))
+
+
+@lru_cache(maxsize=8)
+def _unitless_bounds(bounds):
+    """remove units from a tuple of bounds. Cached, since the same bounds are reused across plots."""
+    return tuple(remove_units(deserialize_value(list(bounds))))
+
+
+def unitless_bounds(bounds):
+    """get bounds as a list of floats in microns, for plotting"""
+    return list(_unitless_bounds(tuple(bounds)))
+
+
+def classify_agent_ids(agent_ids):
+    """
+    map each agent id to its type code (from `AGENT_TYPE_CODES`, or `UNKNOWN_AGENT_CODE`), based on
+    the id's prefix. The prefix test is done once for all ids with numpy's vectorized string functions.
+    """
+    ids = np.array(list(agent_ids), dtype=str)
+    codes = np.full(len(ids), UNKNOWN_AGENT_CODE, dtype=np.int8)
+    for agent_type, prefix in AGENT_ID_PREFIXES.items():
+        codes[np.char.startswith(ids, prefix)] = AGENT_TYPE_CODES[agent_type]
+    return dict(zip(ids.tolist(), codes.tolist()))
+
+
+class AgentTypeView(Mapping):
+    """
+    read-only {time: {'agents': {agent_id: agent_data}}} view of the agents with type code `type_code`
+    in `environment_data` ({time: tumor environment data}). The agents of a time point are filtered when
+    it is accessed, so the emitted agent data is shared with `environment_data` rather than copied into a
+    separate dict for each type.
+
+    `agent_types` caches the type code of each agent id, and can be shared by the views of each type.
+    Agent ids that are not in it yet are classified when they are first filtered, so the agents are
+    not walked in a separate pass to classify them.
+    """
+
+    def __init__(self, environment_data, agent_types, type_code):
+        self.environment_data = environment_data
+        self.agent_types = agent_types
+        self.type_code = type_code
+
+    def __getitem__(self, time):
+        agents = self.environment_data[time]['agents']
+        agent_types = self.agent_types
+        try:
+            return {'agents': {
+                agent_id: agent_data
+                for agent_id, agent_data in agents.items()
+                if agent_types[agent_id] == self.type_code}}
+        except KeyError:
+            agent_types.update(classify_agent_ids(
+                agent_id for agent_id in agents if agent_id not in agent_types))
+            return self[time]
+
+    def __iter__(self):
+        return iter(self.environment_data)
+
+    def __len__(self):
+        return len(self.environment_data)
+
+
 def plots_suite(
         data,
         out_dir=None,
@@ -592,6 +888,8 @@ def plots_suite(
 ):
     """
     plotting function that generates and saves several figures.
+    `data` is the emitted data, as a dict or as an iterable of (time, time_data) pairs, such as
+    `tumor_tcell.library.emitters.iter_database_data`. It is read once.
 
     Returns:
         * fig1: t cell multi-generation timeseries plot
@@ -605,32 +903,21 @@ def plots_suite(
     # pickle.dump(data, data_export)
     # data_export.close()
 
-    # Create dictionaries to store data for different compartments
-    tcell_data = {}
-    tumor_data = {}
-    dendritic_data = {}
-
-    for time, time_data in data.items():
-        # Iterate through compartments
-        for compartment, compartment_data in time_data.items():
-            if compartment == 'tumor_environment':
-                # if 'agents' in compartment_data:
-                all_agents_data = compartment_data['agents']
-
-                # Separate data based on agent type
-                tcell_data.setdefault(time, {'agents': {}})
-                tumor_data.setdefault(time, {'agents': {}})
-                dendritic_data.setdefault(time, {'agents': {}})
-
-                # Separate data for T cells, tumor cells, and dendritic cells
-                for agent_id, agent_data in all_agents_data.items():
-                    if TCELL_ID in agent_id:
-                        tcell_data[time]['agents'][agent_id] = agent_data
-                    elif TUMOR_ID in agent_id:
-                        tumor_data[time]['agents'][agent_id] = agent_data
-                    elif DENDRITIC_ID in agent_id:
-                        dendritic_data[time]['agents'][agent_id] = agent_data
-
+    # Collect the tumor environment of each time point. The data is only read once, and is shared
+    # by the per-type views for the multigen plots and by the snapshots.
+    items = data.items() if isinstance(data, dict) else data
+    environment_data = {
+        time: time_data[TUMOR_ENV_ID]
+        for time, time_data in items
+        if TUMOR_ENV_ID in time_data}
+
+    # views of the agents of each type, which classify the agent ids as they filter them
+    agent_types = {}
+    tcell_data = AgentTypeView(environment_data, agent_types, AGENT_TYPE_CODES[TCELL_ID])
+    tumor_data = AgentTypeView(environment_data, agent_types, AGENT_TYPE_CODES[TUMOR_ID])
+    dendritic_data = AgentTypeView(environment_data, agent_types, AGENT_TYPE_CODES[DENDRITIC_ID])
+
+    from vivarium.plots.agents_multigen import plot_agents_multigen
     # make multi-gen plot for t cells and tumors
     plot_settings = {
         'time_display': '(hr)',
@@ -643,26 +930,56 @@ def plots_suite(
         fig4 = plot_agents_multigen(dendritic_data, plot_settings, out_dir, DENDRITIC_ID)
     else:
         fig4 = None
+
     # snapshots plot shows cells and chemical fields in space at different times
+    fig3 = plot_snapshots_suite(
+        environment_data,
+        bounds=bounds,
+        n_snapshots=n_snapshots,
+        final_time=final_time,
+        out_dir=out_dir)
+
+    return fig1, fig2, fig3, fig4
+
+
+def plot_snapshots_suite(
+        data,
+        bounds,
+        n_snapshots=8,
+        final_time=None,
+        out_dir=None,
+):
+    """
+    make the snapshots plot for plots_suite. The unitless snapshot data is local to this
+    function, so it is released as soon as the figure is made.
+    """
+    from tumor_tcell.plots.snapshots import (
+        plot_snapshots, format_snapshot_data, get_field_range, get_snapshot_times)
+    from tumor_tcell.library.emitters import deserialize_unitless
+
     # extract data
     agents, fields = format_snapshot_data(data)
 
+    # the field range is over all times, but only the sampled times are converted and plotted
+    field_range = get_field_range(fields, list(fields.keys()))
+    _, snapshot_times = get_snapshot_times(list(agents.keys()), n_snapshots, final_time)
+    agents = {time: agents[time] for time in snapshot_times}
+    fields = {time: fields[time] for time in snapshot_times}
+
     # make the plot
-    fig3 = plot_snapshots(
-        bounds=remove_units(deserialize_value(bounds)),
-        agents=remove_units(deserialize_value(agents)),
+    return plot_snapshots(
+        bounds=unitless_bounds(bounds),
+        agents=deserialize_unitless(agents),
         fields=fields,
+        field_range=field_range,
         tag_colors=TAG_COLORS,
         n_snapshots=n_snapshots,
-        final_time=final_time,
         out_dir=out_dir,
         filename='snapshots.pdf',
         default_font_size=48,
         field_label_size=48,
         time_display='hr')
 
-    return fig1, fig2, fig3, fig4
-
 
 def make_snapshot_video(
         data,
@@ -672,16 +989,26 @@ def make_snapshot_video(
 ):
     """
     Make a video of a simulation.
+
+    Only the times that are shown in the video are deserialized and stripped of units,
+    rather than the full simulation history.
     """
-    n_times = len(data.keys())
-    step = math.ceil(n_times / n_steps)
+    from tumor_tcell.plots.video import make_video
+    from tumor_tcell.library.emitters import deserialize_unitless
+
+    times = list(data.keys())
+    step = math.ceil(len(times) / n_steps)
+
+    # make_video shows every frame but the last, so the final time is kept after the shown times
+    video_times = times[:-1:step] + times[-1:]
+    video_data = {time: data[time] for time in video_times}
 
     make_video(
-        data=remove_units(deserialize_value(data)),
-        bounds=remove_units(deserialize_value(bounds)),
+        data=deserialize_unitless(video_data),
+        bounds=unitless_bounds(bounds),
         agent_shape='circle',
         tag_colors=TAG_COLORS,
-        step=step,
+        step=1,
         out_dir=out_dir,
         time_display='hr',
         filename='tumor_tcell_video'
@@ -802,24 +1129,12 @@ workflow_library = {
     },
 }
 
-# def tryit():
-#     data, exp = large_experiment(
-#             n_tcells=1,
-#             n_tumors=0,
-#             n_dendritic=0,
-#             n_tcells_lymph_node=0,
-#             tumors_state_PDL1n=0.5,
-#             tcells_total_PD1n=8,
-#             dendritic_state_active=0.5,
-#             lymph_nodes=True,
-#             total_time=0,
-#             field_molecules=['IFNg', 'tumor_debris'],
-#             return_experiment=True,
-#         )
-
-
 # run with python tumor_tcell/experiments/main.py [workflow id]
 if __name__ == '__main__':
+    # compile the numba kernels before the experiments run, rather than in their first diffusion step.
+    # imports of this module leave them to compile on first use. Set TTC_JIT=0 to skip this.
+    if os.environ.get('TTC_JIT', '1') != '0':
+        precompile_kernels()
     Control(
         experiments=experiments_library,
         plots=plots_library,
@@ -1,321 +1,306 @@
-import pandas as pd
-
-def data_to_dataframes(data, lymph_nodes=False):
-
-    # Create a new dictionary with the 'tumor_environment' data based on restructuring
-    new_data = {}
-
-    for key, value in data.items():
-        # Extract 'tumor_environment' data and keep the outer structure
-        new_data[key] = value['tumor_environment']
-    new_data.keys()
-
-    #Convert to initial dataframe
-    df_data = pd.DataFrame(new_data)
-
-    #Extract agents from the data
-    df_copy = df_data.copy()
-    df_agents = df_copy.loc['agents']
-    agents_dict = df_agents.to_dict()
-
-    #reformat the dictionary into mulitiindexed dataframe
-    reform_agents = {(level1_key, level2_key): values
-              for level1_key, level2_dict in agents_dict.items()
-              for level2_key, values in level2_dict.items()
-              }
-    df_agents_exp1 = pd.DataFrame(reform_agents)
-    df_agents_multi = df_agents_exp1.T
-    names=['time', 'cell']
-    df_agents_multi.index.set_names(names, inplace=True)
-
-
-
-    ###################################
-    #Subset only T cells from all agents
-    df_tcell_agents = df_agents_multi.iloc[df_agents_multi.index.get_level_values('cell').str.contains('tcell'), :]
-
-    #Subset categories and recombine in T cells
-    df_tcell_trans = df_tcell_agents.T
-    tcell_categories = []
-
-    #Extract each feature - boundary, internal, neighbors
-    for category in df_tcell_trans.index.values:
-      df_boundary_sub = df_tcell_trans.loc[category,:]
-      tcell_boundary_dict = df_boundary_sub.to_dict()
-      df_boundary_sub2 = pd.DataFrame(tcell_boundary_dict)
-      tcell_categories.append(df_boundary_sub2.T)
-
-    #concatenate dataframes
-    tcell_data = pd.concat(tcell_categories, axis=1)
-
-    #reformat T cell data for plotting
-    tcell_data['IFNg'] = tcell_data['external'].apply(lambda x: x.get('IFNg'))
-    tcell_data['transferable_cytotoxic_packets'] = tcell_data['transfer'].apply(lambda x: x.get('cytotoxic_packets'))
-    tcell_data['X'] = tcell_data['location'].apply(lambda x: x[0])
-    tcell_data['Y'] = tcell_data['location'].apply(lambda x: x[1])
-
-    #Only select columns of interest
-    tcell_columns = ['cell_state', 'IFNg', 'transferable_cytotoxic_packets', 'X', 'Y']
-    tcell_data_form = tcell_data[tcell_columns]
-    tcell_data_form.index.set_names(names, inplace=True)
-
-    # reset index for plotting
-    tcell_plot = tcell_data_form.reset_index()
-
-
-    ########################################3
-    # Subset only Tumor cells from all agents
-    df_tumor_agents = df_agents_multi.iloc[df_agents_multi.index.get_level_values('cell').str.contains('tumor'), :]
-
-    # Subset categories and recombine in Tumor cells
-    df_tumor_trans = df_tumor_agents.T
-    tumor_categories = []
-
-    # Extract each feature - boundary, internal, neighbors
-    for category in df_tumor_trans.index.values:
-        df_boundary_sub = df_tumor_trans.loc[category, :]
-        tumor_boundary_dict = df_boundary_sub.to_dict()
-        df_boundary_sub2 = pd.DataFrame(tumor_boundary_dict)
-        tumor_categories.append(df_boundary_sub2.T)
-
-    # concatenate dataframes
-    tumor_data = pd.concat(tumor_categories, axis=1)
-    tumor_data;
-
-    # reformat Tumor cell data for plotting
-    tumor_data['IFNg'] = tumor_data['external'].apply(lambda x: x.get('IFNg'))
-    tumor_data['cytotoxic_packets'] = tumor_data['receive'].apply(lambda x: x.get('cytotoxic_packets'))
-    tumor_data['X'] = tumor_data['location'].apply(lambda x: x[0])
-    tumor_data['Y'] = tumor_data['location'].apply(lambda x: x[1])
-    tumor_data.columns
-
-    # Only select columns of interest
-    tumor_columns = ['cell_state', 'IFNg', 'cytotoxic_packets', 'X', 'Y']
-    tumor_data_form = tumor_data[tumor_columns]
-    tumor_data_form.index.set_names(names, inplace=True)
-
-    # reset index for plotting
-    tumor_plot = tumor_data_form.reset_index()
-
-
-    ################################
-    ####Extract death log statistics
-    df_death = df_copy.loc['log']
-    death_dict = df_death.to_dict()
-
-    # reformat the dictionary into mulitiindexed dataframe
-    reform_death = {(level1_key, level2_key): values
-                    for level1_key, level2_dict in death_dict.items()
-                    for level2_key, values in level2_dict.items()}
-
-    # Make dataframe
-    df_death_exp1 = pd.DataFrame(reform_death)
-    df_death_multi = df_death_exp1.T
-    names = ['time', 'cell']
-    df_death_multi.index.set_names(names, inplace=True)
-    df_death_multi.columns = ['time', 'death']
-
-    # subset only where death is not equal to false
-    df_death_sub = df_death_multi[~(df_death_multi['death']==False)]
-
-    if df_death_sub.empty:
-        df_tcell_death = pd.DataFrame({})
-        df_tumor_death = pd.DataFrame({})
-    else:
-        # Only get the final log of the death than contains all the death information
-        df_last_death = df_death_sub.loc[df_death_sub.index.levels[0][-1]]
-        df_last_death['time'] = df_last_death['time'] / 3600
-
-        # Subset only T cells from all agents
-        df_tcell_death = df_last_death.iloc[df_last_death.index.get_level_values('cell').str.contains('tcell'), :]
-        df_tumor_death = df_last_death.iloc[df_last_death.index.get_level_values('cell').str.contains('tumor'), :]
-
-        ########################################
-        ##Do for T cells
-        # sort deaths by time
-        df_tcell_death.sort_values(by=['time'], inplace=True)
-
-        # Get different death groupings and count total over time
-        death_types_list = list(df_tcell_death['death'].unique())
-        for death_type in death_types_list:
-            df_tcell_death[death_type] = df_tcell_death['death'].apply(lambda x: 1 if x == death_type else 0)
-            df_tcell_death['total_' + str(death_type)] = df_tcell_death[death_type].cumsum()
-
-        # get total death count over time
-        total_col_t = [col for col in df_tcell_death.columns if 'total' in col]
-        df_tcell_death['total_death'] = df_tcell_death[total_col_t].sum(axis=1)
-
-        ##Do for Tumors
-        # sort deaths by time
-        df_tumor_death.sort_values(by=['time'], inplace=True)
-
-        # Get different death groupings and count total over time
-        death_types_list = list(df_tumor_death['death'].unique())
-        for death_type in death_types_list:
-            df_tumor_death[death_type] = df_tumor_death['death'].apply(lambda x: 1 if x == death_type else 0)
-            df_tumor_death['total_' + str(death_type)] = df_tumor_death[death_type].cumsum()
-
-        # get total death count over time
-        total_col = [col for col in df_tumor_death.columns if 'total' in col]
-        df_tumor_death['total_death'] = df_tumor_death[total_col].sum(axis=1)
-
-    if lymph_nodes==True:
-        ###################################
-        # Subset only DC cells from all agents
-        df_dendritic_agents = df_agents_multi.iloc[
-                              df_agents_multi.index.get_level_values('cell').str.contains('dendritic'), :]
-
-        # Subset categories and recombine in T cells
-        df_dendritic_trans = df_dendritic_agents.T
-        dendritic_categories = []
-
-        # Extract each feature - boundary, internal, neighbors
-        for category in df_dendritic_trans.index.values:
-            df_boundary_sub = df_dendritic_trans.loc[category, :]
-            dendritic_boundary_dict = df_boundary_sub.to_dict()
-            df_boundary_sub2 = pd.DataFrame(dendritic_boundary_dict)
-            dendritic_categories.append(df_boundary_sub2.T)
-
-        # concatenate dataframes
-        dendritic_data = pd.concat(dendritic_categories, axis=1)
-
-        # reformat T cell data for plotting
-        dendritic_data['tumor_debris'] = dendritic_data['external'].apply(lambda x: x.get('tumor_debris'))
-        dendritic_data['X'] = dendritic_data['location'].apply(lambda x: x[0])
-        dendritic_data['Y'] = dendritic_data['location'].apply(lambda x: x[1])
-
-        # Only select columns of interest
-        dendritic_columns = ['cell_state', 'tumor_debris', 'X', 'Y']
-        dendritic_data_form = dendritic_data[dendritic_columns]
-        dendritic_data_form.index.set_names(names, inplace=True)
-
-        # reset index for plotting
-        dendritic_plot = dendritic_data_form.reset_index()
-
-        if df_death_sub.empty:
-            df_dendritic_death = pd.DataFrame({})
-        else:
-            #get dendritic death stats
-            df_dendritic_death = df_last_death.iloc[df_last_death.index.get_level_values('cell').str.contains('dendritic'),:]
-
-            ########################################
-            ##Do for dendritic cells
-            # sort deaths by time
-            df_dendritic_death.sort_values(by=['time'], inplace=True)
-
-            # Get different death groupings and count total over time
-            death_types_list = list(df_dendritic_death['death'].unique())
-            for death_type in death_types_list:
-                df_dendritic_death[death_type] = df_dendritic_death['death'].apply(lambda x: 1 if x == death_type else 0)
-                df_dendritic_death['total_' + str(death_type)] = df_dendritic_death[death_type].cumsum()
-
-            # get total death count over time
-            total_col_t = [col for col in df_dendritic_death.columns if 'total' in col]
-            df_dendritic_death['total_death'] = df_dendritic_death[total_col_t].sum(axis=1)
-
-        return df_tumor_death, df_tcell_death, tumor_plot, tcell_plot, df_dendritic_death, dendritic_plot
-    else:
-        return df_tumor_death, df_tcell_death, tumor_plot, tcell_plot
-
-
-
-#Function for processing data when there are no T cells
-
-def control_data_to_dataframes(data):
-    # Convert to initial dataframe
-    df_data = pd.DataFrame(data)
-
-    # Extract agents from the data
-    df_copy = df_data.copy()
-    df_agents = df_copy.iloc[0, :]
-    agents_dict = df_agents.to_dict()
-
-    # reformat the dictionary into mulitiindexed dataframe
-    reform_agents = {(level1_key, level2_key): values
-                     for level1_key, level2_dict in agents_dict.items()
-                     for level2_key, values in level2_dict.items()
-                     }
-    df_agents_exp1 = pd.DataFrame(reform_agents)
-    df_agents_multi = df_agents_exp1.T
-    names = ['time', 'cell']
-    df_agents_multi.index.set_names(names, inplace=True)
-
-    ########################################3
-    # Subset only Tumor cells from all agents
-    df_tumor_agents = df_agents_multi.iloc[df_agents_multi.index.get_level_values('cell').str.contains('tumor'), :]
-
-    # Subset categories and recombine in Tumor cells
-    df_tumor_trans = df_tumor_agents.T
-    tumor_categories = []
-
-    # Extract each feature - boundary, internal, neighbors
-    for category in df_tumor_trans.index.values:
-        df_boundary_sub = df_tumor_trans.loc[category, :]
-        tumor_boundary_dict = df_boundary_sub.to_dict()
-        df_boundary_sub2 = pd.DataFrame(tumor_boundary_dict)
-        tumor_categories.append(df_boundary_sub2.T)
-
-    # concatenate dataframes
-    tumor_data = pd.concat(tumor_categories, axis=1)
-    tumor_data;
-
-    # reformat Tumor cell data for plotting
-    tumor_data['IFNg'] = tumor_data['external'].apply(lambda x: x.get('IFNg'))
-    tumor_data['cytotoxic_packets'] = tumor_data['receive'].apply(lambda x: x.get('cytotoxic_packets'))
-    tumor_data['X'] = tumor_data['location'].apply(lambda x: x[0])
-    tumor_data['Y'] = tumor_data['location'].apply(lambda x: x[1])
-    tumor_data.columns
-
-    # Only select columns of interest
-    tumor_columns = ['cell_state', 'IFNg', 'cytotoxic_packets', 'X', 'Y']
-    tumor_data_form = tumor_data[tumor_columns]
-    tumor_data_form.index.set_names(names, inplace=True)
-
-    # reset index for plotting
-    tumor_plot = tumor_data_form.reset_index()
-
-    ################################
-    ####Extract death log statistics
-    df_death = df_copy.iloc[1, :]
-    death_dict = df_death.to_dict()
-
-    # reformat the dictionary into mulitiindexed dataframe
-    reform_death = {(level1_key, level2_key): values
-                    for level1_key, level2_dict in death_dict.items()
-                    for level2_key, values in level2_dict.items()}
-
-    # Make dataframe
-    df_death_exp1 = pd.DataFrame(reform_death)
-    df_death_multi = df_death_exp1.T
-    names = ['time', 'cell']
-    df_death_multi.index.set_names(names, inplace=True)
-    df_death_multi.columns = ['time', 'death']
-
-    # subset only where death is not equal to false
-    df_death_sub = df_death_multi[~(df_death_multi['death']==False)]
-
-    if df_death_sub.empty:
-        return pd.DataFrame({}), tumor_plot
-
-    # Only get the final log of the death than contains all the death information
-    df_last_death = df_death_sub.loc[df_death_sub.index.levels[0][-1]]
-    df_last_death['time'] = df_last_death['time'] / 3600
-
-    # Subset only T cells from all agents
-    df_tumor_death = df_last_death.iloc[df_last_death.index.get_level_values('cell').str.contains('tumor'), :]
-
-    ##Do for Tumors
-    # sort deaths by time
-    df_tumor_death.sort_values(by=['time'], inplace=True)
-
-    # Get different death groupings and count total over time
-    death_types_list = list(df_tumor_death['death'].unique())
-    for death_type in death_types_list:
-        df_tumor_death[death_type] = df_tumor_death['death'].apply(lambda x: 1 if x == death_type else 0)
-        df_tumor_death['total_' + str(death_type)] = df_tumor_death[death_type].cumsum()
-
-    # get total death count over time
-    total_col = [col for col in df_tumor_death.columns if 'total' in col]
-    df_tumor_death['total_death'] = df_tumor_death[total_col].sum(axis=1)
-
-    return df_tumor_death, tumor_plot
\ No newline at end of file
+import numpy as np
+import pandas as pd
+try:
+    from numba import njit
+except ImportError:
+    # without numba, the death counts run as a python loop
+    njit = None
+
+
+# agent ids are made as f'{cell_type}_{n}', and daughters append to the mother's id
+CELL_TYPES = ('tcell', 'tumor', 'dendritic')
+
+
+def cell_type_masks(index, cell_types=CELL_TYPES):
+    """
+    boolean masks of the rows of `index` whose 'cell' id starts with each of `cell_types`, as
+    {cell_type: mask}. Each agent id repeats at every time point, so the ids are factorized once,
+    each type is tested over the unique ids with one vectorized startswith, and mapped back to the rows.
+    """
+    codes, unique_ids = pd.factorize(index.get_level_values('cell'))
+    unique_ids = np.asarray(unique_ids, dtype=str)
+    return {
+        cell_type: np.char.startswith(unique_ids, cell_type)[codes]
+        for cell_type in cell_types}
+
+
+def death_log_dataframe(log):
+    """
+    dataframe with the 'time' (in hours) and 'death' state of the agents that died in the death `log`,
+    {agent_id: (time, death)}, indexed by 'cell'. Logs that also have living agents, with a False death,
+    are filtered to the deaths. The few death types are stored as a categorical, so the 'death' column
+    holds integer codes rather than a string object for each death, and is compared by its codes.
+    """
+    df_death = pd.DataFrame.from_dict(log, orient='index', columns=['time', 'death'])
+    df_death.index.set_names('cell', inplace=True)
+    df_death['death'] = df_death['death'].astype('category')
+    df_death = df_death[~(df_death['death'] == False)].copy()
+    df_death['death'] = df_death['death'].cat.remove_unused_categories()
+    df_death['time'] = df_death['time'] / 3600
+    return df_death
+
+
+def flatten_column(df, column):
+    """
+    flatten the dicts in `column` of `df` into a dataframe with a column for each of their keys.
+    All the rows are flattened in one pass with `pd.json_normalize`, rather than a lambda for each row.
+    """
+    return pd.json_normalize(df[column].tolist()).set_axis(df.index)
+
+
+def location_columns(df):
+    """
+    the X and Y columns of the 'location' column of `df`, split from all the locations at once. The
+    coordinates keep their types, such as pint Quantities, and `df` without rows gives empty columns.
+    """
+    if df.empty:
+        return pd.Series(index=df.index, dtype=object), pd.Series(index=df.index, dtype=object)
+    locations = pd.DataFrame(df['location'].tolist(), index=df.index)
+    return locations[0], locations[1]
+
+
+def agents_dataframe(agents_by_time):
+    """
+    dataframe with a row for each agent at each time of `agents_by_time`, {time: {agent_id: state}},
+    indexed by ('time', 'cell'), and a column for each port category of the agents' states
+    (boundary, internal, neighbors).
+    """
+    df_agents = pd.DataFrame.from_dict({
+        (time, agent_id): agent_state
+        for time, agents in agents_by_time.items()
+        for agent_id, agent_state in agents.items()}, orient='index')
+    df_agents.index.set_names(['time', 'cell'], inplace=True)
+    return df_agents
+
+
+def expand_categories(df_agents):
+    """
+    expand the port categories of `df_agents` into a column for each of their variables, with the
+    columns of all the categories side by side. Agents without a category get NaN for its variables.
+    """
+    return pd.concat([
+        pd.DataFrame(
+            [state if isinstance(state, dict) else {} for state in df_agents[category]],
+            index=df_agents.index)
+        for category in df_agents.columns], axis=1)
+
+
+def cumulative_type_counts(codes, n_types):
+    """
+    the running count of each of `n_types` death types over the integer `codes` of a time-sorted
+    sequence of deaths, as an (n_deaths, n_types) array filled in one pass
+    """
+    counts = np.zeros(n_types, dtype=np.int64)
+    cumulative = np.zeros((codes.size, n_types), dtype=np.int64)
+    for index in range(codes.size):
+        counts[codes[index]] += 1
+        cumulative[index] = counts
+    return cumulative
+
+
+if njit is not None:
+    cumulative_type_counts = njit(cache=True)(cumulative_type_counts)
+
+
+def add_death_counts(df_death):
+    """
+    sort `df_death` by time, and add a column for each death type that marks its deaths, a
+    'total_<type>' column with its running count, and the running 'total_death' of all the types
+    """
+    df_death = df_death.sort_values(by=['time'])
+    codes, death_types = pd.factorize(df_death['death'])
+    n_types = len(death_types)
+    totals = cumulative_type_counts(codes.astype(np.int64), n_types)
+
+    # all the count columns are filled in one preallocated array, interleaving each type's marks
+    # and running totals, and joined to the deaths at once rather than inserted column by column
+    counts = np.empty((len(df_death), 2 * n_types + 1), dtype=np.int64)
+    counts[:, 0:-1:2] = codes[:, None] == np.arange(n_types)
+    counts[:, 1:-1:2] = totals
+    counts[:, -1] = totals.sum(axis=1)
+    count_columns = []
+    for death_type in death_types:
+        count_columns += [death_type, 'total_' + str(death_type)]
+    count_columns.append('total_death')
+    return pd.concat(
+        [df_death, pd.DataFrame(counts, columns=count_columns, index=df_death.index)], axis=1)
+
+
+# the plotting columns of each cell type that are read from the dicts of the expanded categories,
+# as {column: (category column, key)}. The 'cell_state', 'X' and 'Y' columns are included for every type
+PLOT_COLUMNS = {
+    'tcell': {
+        'IFNg': ('external', 'IFNg'),
+        'transferable_cytotoxic_packets': ('transfer', 'cytotoxic_packets')},
+    'tumor': {
+        'IFNg': ('external', 'IFNg'),
+        'cytotoxic_packets': ('receive', 'cytotoxic_packets')},
+    'dendritic': {
+        'tumor_debris': ('external', 'tumor_debris')},
+}
+
+
+def cell_type_plot_data(df_agents_data, mask, plot_columns):
+    """
+    the plotting data of one cell type, from the rows of `df_agents_data` (agents with expanded categories)
+    in `mask`: their 'cell_state', the `plot_columns` ({column: (category column, key)}), and their
+    'X' and 'Y' locations, with the ('time', 'cell') index reset to columns
+    """
+    cell_data = df_agents_data.iloc[mask, :]
+    plot_data = pd.DataFrame({'cell_state': cell_data['cell_state']}, index=cell_data.index)
+    for column, (category_column, key) in plot_columns.items():
+        # agents without the key get NaN, rather than failing when none of them have it
+        plot_data[column] = flatten_column(cell_data, category_column).reindex(columns=[key])[key]
+    plot_data['X'], plot_data['Y'] = location_columns(cell_data)
+    return plot_data.reset_index()
+
+
+def plot_dataframes(df_agents_data, agent_masks, cell_types):
+    """{cell_type: plotting data} for each of `cell_types`, from `cell_type_plot_data`"""
+    return {
+        cell_type: cell_type_plot_data(df_agents_data, agent_masks[cell_type], PLOT_COLUMNS[cell_type])
+        for cell_type in cell_types}
+
+
+def data_to_dataframes(data, lymph_nodes=False):
+    # `data` is either the {time: data} dict of a simulation, or an iterable of its (time, data)
+    # pairs, such as `emitters.iter_database_data`, so that only the agents and the final log are kept
+    timepoints = data.items() if isinstance(data, dict) else data
+
+    # Extract the 'tumor_environment' agents at each time, and the log of the final time
+    agents_by_time = {}
+    last_time = None
+    for time, timepoint in timepoints:
+        environment = timepoint['tumor_environment']
+        agents_by_time[time] = environment['agents']
+        if last_time is None or time > last_time:
+            last_time = time
+            last_log = environment['log']
+
+    #Extract agents from the data into a mulitiindexed dataframe
+    df_agents_multi = agents_dataframe(agents_by_time)
+
+    # Expand the categories - boundary, internal, neighbors - into columns once for all the agents,
+    # and mask the rows of each cell type
+    df_agents_data = expand_categories(df_agents_multi)
+    agent_masks = cell_type_masks(df_agents_multi.index)
+
+    # reformat the data of each cell type for plotting
+    cell_types = ['tcell', 'tumor', 'dendritic'] if lymph_nodes else ['tcell', 'tumor']
+    plot_data = plot_dataframes(df_agents_data, agent_masks, cell_types)
+    tcell_plot = plot_data['tcell']
+    tumor_plot = plot_data['tumor']
+
+
+    ################################
+    ####Extract death log statistics
+    # the log accumulates, so only the final log is needed for all the death information
+    df_last_death = death_log_dataframe(last_log)
+
+    if df_last_death.empty:
+        df_tcell_death = pd.DataFrame({})
+        df_tumor_death = pd.DataFrame({})
+    else:
+        # Subset only T cells from all agents
+        death_masks = cell_type_masks(df_last_death.index)
+        df_tcell_death = df_last_death.iloc[death_masks['tcell'], :]
+        df_tumor_death = df_last_death.iloc[death_masks['tumor'], :]
+
+        ########################################
+        ##Do for T cells
+        # sort deaths by time, and count each death type and the total over time
+        df_tcell_death = add_death_counts(df_tcell_death)
+
+        ##Do for Tumors
+        # sort deaths by time, and count each death type and the total over time
+        df_tumor_death = add_death_counts(df_tumor_death)
+
+    if lymph_nodes==True:
+        dendritic_plot = plot_data['dendritic']
+
+        if df_last_death.empty:
+            df_dendritic_death = pd.DataFrame({})
+        else:
+            #get dendritic death stats
+            df_dendritic_death = df_last_death.iloc[death_masks['dendritic'], :]
+
+            ########################################
+            ##Do for dendritic cells
+            # sort deaths by time, and count each death type and the total over time
+            df_dendritic_death = add_death_counts(df_dendritic_death)
+
+        return df_tumor_death, df_tcell_death, tumor_plot, tcell_plot, df_dendritic_death, dendritic_plot
+    else:
+        return df_tumor_death, df_tcell_death, tumor_plot, tcell_plot
+
+
+
+#Function for processing data when there are no T cells
+
+def control_data_to_dataframes(data):
+    # Convert to initial dataframe
+    df_data = pd.DataFrame(data)
+
+    # Extract agents from the data
+    df_copy = df_data.copy()
+    df_agents = df_copy.iloc[0, :]
+    agents_dict = df_agents.to_dict()
+
+    # reformat the dictionary into mulitiindexed dataframe
+    df_agents_multi = agents_dataframe(agents_dict)
+
+    ########################################3
+    # reformat Tumor cell data for plotting
+    tumor_plot = cell_type_plot_data(
+        expand_categories(df_agents_multi),
+        cell_type_masks(df_agents_multi.index, ['tumor'])['tumor'],
+        PLOT_COLUMNS['tumor'])
+
+    ################################
+    ####Extract death log statistics
+    # the log accumulates, so only the final log is needed for all the death information
+    df_death = df_copy.iloc[1, :]
+    df_last_death = death_log_dataframe(df_death[df_death.index.max()])
+
+    if df_last_death.empty:
+        return pd.DataFrame({}), tumor_plot
+
+    # Subset only T cells from all agents
+    df_tumor_death = df_last_death.iloc[cell_type_masks(df_last_death.index, ['tumor'])['tumor'], :]
+
+    ##Do for Tumors
+    # sort deaths by time, and count each death type and the total over time
+    df_tumor_death = add_death_counts(df_tumor_death)
+
+    return df_tumor_death, tumor_plot
+
+def test_cumulative_type_counts(n_deaths=50, n_types=3, seed=0):
+    """the running counts of the kernel, and of its python version, match a cumsum of each type's marks"""
+    codes = np.random.default_rng(seed).integers(0, n_types, n_deaths)
+    expected = np.cumsum(codes[:, None] == np.arange(n_types), axis=0)
+    python_counts = getattr(cumulative_type_counts, 'py_func', cumulative_type_counts)
+    assert np.array_equal(cumulative_type_counts(codes, n_types), expected)
+    assert np.array_equal(python_counts(codes, n_types), expected)
+
+
+def test_add_death_counts():
+    """the death counts match marking and summing each death type's column in turn"""
+    log = {
+        'tumor_0': (7200, 'apoptosis'), 'tumor_1': (3600, 'tcell_attack'), 'tumor_2': (10800, False),
+        'tumor_3': (1800, 'apoptosis'), 'tumor_4': (14400, 'tcell_attack'), 'tumor_5': (9000, 'apoptosis')}
+    df_death = death_log_dataframe(log)
+    death_counts = add_death_counts(df_death).astype({'death': object})
+
+    expected = df_death.astype({'death': object}).sort_values(by=['time'])
+    for death_type in list(expected['death'].unique()):
+        expected[death_type] = expected['death'].apply(lambda x: 1 if x == death_type else 0)
+        expected['total_' + str(death_type)] = expected[death_type].cumsum()
+    total_columns = [column for column in expected.columns if 'total' in column]
+    expected['total_death'] = expected[total_columns].sum(axis=1)
+
+    pd.testing.assert_frame_equal(death_counts, expected, check_dtype=False, check_like=True)
+
+
+if __name__ == '__main__':
+    test_cumulative_type_counts()
+    test_add_death_counts()
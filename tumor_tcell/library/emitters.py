@@ -0,0 +1,715 @@
+"""
+========
+Emitters
+========
+
+Emitters for tumor-tcell simulations. These are registered with vivarium's emitter registry when
+this module is imported, and can be selected by name with `tumor_tcell_abm`'s `emitter` argument.
+
+* **array**: `ArrayEmitter` stores the agents of each emit as flat numpy columns, with one row per agent.
+  Units are stripped when the data is emitted and tracked once per column, so numeric variables are kept as
+  arrays of floats instead of a nested dict per agent. The nested timeseries is rebuilt by `get_data`.
+* **parquet**: `ParquetEmitter` writes agent trajectories (time, agent_id, x, y, diameter, cell_state) to a
+  Parquet dataset on disk, and keeps only the rest of the data in memory. `get_data` rebuilds the agents
+  from the trajectories, which is enough for snapshots and videos but not for multigen plots of other
+  variables. This requires pyarrow (``pip install tumor-tcell[parquet]``).
+* **delta**: `DeltaEmitter` stores only the agent variables that changed since the previous emit, and
+  rebuilds the full agents of each emit in `get_data`. Variables such as diameter and cell_state are
+  rarely updated, so they are stored once per change instead of once per emit.
+* **buffered_database**: `BufferedDatabaseEmitter` writes to MongoDB like vivarium's "database" emitter,
+  but collects the emits in batches and writes them from a background thread, so the simulation does not
+  wait for the database on every emit. Each batch is encoded to BSON directly and inserted with one
+  `insert_many`.
+"""
+
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from bson import encode as bson_encode
+from bson.raw_bson import RawBSONDocument
+
+from vivarium.core.emitter import RAMEmitter, DatabaseEmitter, deserialize_value
+from vivarium.library.dict_utils import deep_merge
+from vivarium.core.registry import emitter_registry
+from vivarium.core.serialize import Quantity, serialize_value
+from vivarium.library.units import remove_units
+
+from tumor_tcell import EXPERIMENT_OUT_DIR
+
+AGENTS_PATH = ('tumor_environment', 'agents')
+LOCATION_PATH = ('boundary', 'location')
+DIAMETER_PATH = ('boundary', 'diameter')
+CELL_STATE_PATH = ('internal', 'cell_state')
+
+# int8 codes for the cell states in the trajectories. -1 is for unknown states
+CELL_STATES = ('PDL1p', 'PDL1n', 'PD1p', 'PD1n', 'inactive', 'active')
+CELL_STATE_CODES = {cell_state: code for code, cell_state in enumerate(CELL_STATES)}
+UNKNOWN_CELL_STATE = -1
+
+# the prefix of values with units, as serialized by vivarium's UnitsSerializer
+UNITS_PREFIX = '!units['
+
+# MongoDB's limit on the size of a BSON document
+MAX_DOCUMENT_SIZE = 16 * 1024 * 1024
+
+
+def flatten_paths(state, prefix=()):
+    """yield (path, value) for every leaf of a nested dict"""
+    for key, value in state.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            yield from flatten_paths(value, path)
+        else:
+            yield path, value
+
+
+def strip_units(value):
+    """return (magnitude, unit) for a value, or a list of values that share a unit"""
+    value = deserialize_value(value)
+    if isinstance(value, Quantity):
+        return value.magnitude, value.units
+    if isinstance(value, list) and value and isinstance(value[0], Quantity):
+        unit = value[0].units
+        return [v.to(unit).magnitude for v in value], unit
+    return value, None
+
+
+def deserialize_unitless(value):
+    """
+    deserialize emitted `value` with units stripped, like `remove_units(deserialize_value(value))`
+    but in one pass. Serialized quantities, '!units[<magnitude> <unit>]', are read straight to their
+    magnitude rather than parsed into Quantities, and Quantities that are already deserialized are
+    replaced by their magnitude. Quantities with non-scalar magnitudes, such as arrays, are deserialized
+    with `deserialize_value`.
+    """
+    if isinstance(value, dict):
+        return {key: deserialize_unitless(subvalue) for key, subvalue in value.items()}
+    if isinstance(value, list):
+        return [deserialize_unitless(subvalue) for subvalue in value]
+    if isinstance(value, str):
+        if value.startswith(UNITS_PREFIX) and value.endswith(']'):
+            magnitude = value[len(UNITS_PREFIX):-1].split(' ', 1)[0]
+            for number_type in (int, float):
+                try:
+                    return number_type(magnitude)
+                except ValueError:
+                    pass
+            return deserialize_value(value).magnitude
+        if value.startswith('!'):
+            return remove_units(deserialize_value(value))
+        return value
+    if isinstance(value, Quantity):
+        return value.magnitude
+    return value
+
+
+def to_column(values):
+    """convert a list of values to a numpy array, keeping mixed or nested values as objects"""
+    value_types = {type(value) for value in values}
+    if len(value_types) == 1 and value_types <= {float, int, bool, str}:
+        return np.asarray(values)
+    if value_types == {list}:
+        try:
+            return np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            pass
+    column = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        column[index] = value
+    return column
+
+
+def assoc_path(d, path, value):
+    """set `value` at `path` in the nested dict `d`"""
+    for key in path[:-1]:
+        d = d.setdefault(key, {})
+    d[path[-1]] = value
+
+
+def get_path(d, path, default=None):
+    """get the value at `path` in the nested dict `d`"""
+    for key in path:
+        if not isinstance(d, dict) or key not in d:
+            return default
+        d = d[key]
+    return d
+
+
+def query_data(data, query):
+    """
+    keep only the values of `data` ({time: time_data}) at the paths in `query`, like vivarium's
+    RAMEmitter does for a query
+    """
+    queried = {}
+    for time, time_data in data.items():
+        queried[time] = {}
+        for path in query:
+            value = get_path(time_data, tuple(path))
+            if value is not None:
+                assoc_path(queried[time], tuple(path), value)
+    return queried
+
+
+def pop_agents(data, agents_path):
+    """
+    take the agents out of emitted data, copying only the dicts along `agents_path`.
+    Returns (data without the agents, agents), with agents None if they are not in the data.
+    """
+    data = dict(data)
+    parent = data
+    for key in agents_path[:-1]:
+        if not isinstance(parent.get(key), dict):
+            return data, None
+        parent[key] = dict(parent[key])
+        parent = parent[key]
+    agents = parent.pop(agents_path[-1], None)
+    return data, agents
+
+
+def put_agents(data, agents_path, agents):
+    """
+    return a copy of `data` with `agents` at `agents_path`, copying only the dicts along
+    the path, so the stored data is not changed.
+    """
+    data = dict(data)
+    parent = data
+    for key in agents_path[:-1]:
+        parent[key] = dict(parent.get(key, {}))
+        parent = parent[key]
+    parent[agents_path[-1]] = agents
+    return data
+
+
+def diff_paths(previous, current, tolerance=0.0):
+    """
+    get the changes from `previous` to `current`, two {path: value} dicts. Returns (changed, removed),
+    with the {path: value} that are new or changed, and the paths that are no longer there.
+    Floats that change by no more than `tolerance` are not counted as changes.
+    """
+    changed = {}
+    for path, value in current.items():
+        if path in previous:
+            old_value = previous[path]
+            if old_value is value:
+                continue
+            if tolerance and isinstance(value, float) and isinstance(old_value, float):
+                if abs(value - old_value) <= tolerance:
+                    continue
+            elif type(old_value) is type(value) and old_value == value:
+                continue
+        changed[path] = value
+    removed = [path for path in previous if path not in current]
+    return changed, removed
+
+
+def nest_paths(flat):
+    """build a nested dict from a {path: value} dict"""
+    nested = {}
+    for path, value in flat.items():
+        assoc_path(nested, path, value)
+    return nested
+
+
+class AgentTable:
+    """
+    The agents of a single emit, in a columnar layout.
+
+    Each column holds the values of one variable path for the rows (agents) that have it,
+    so agents of different types can share a table.
+    """
+    __slots__ = ('agent_ids', 'columns')
+
+    def __init__(self, agents, column_units):
+        self.agent_ids = list(agents.keys())
+        rows = {}
+        values = {}
+        for row, state in enumerate(agents.values()):
+            for path, value in flatten_paths(state):
+                magnitude, unit = strip_units(value)
+                if unit is not None:
+                    column_units.setdefault(path, unit)
+                rows.setdefault(path, []).append(row)
+                values.setdefault(path, []).append(magnitude)
+        self.columns = {
+            path: (np.asarray(rows[path], dtype=np.int32), to_column(path_values))
+            for path, path_values in values.items()}
+
+    def __len__(self):
+        return len(self.agent_ids)
+
+    def column(self, path):
+        """get (agent_ids, values) for the agents that have a value at `path`"""
+        rows, values = self.columns[path]
+        agent_ids = [self.agent_ids[row] for row in rows]
+        return agent_ids, values
+
+    def to_dict(self, column_units=None):
+        """rebuild the nested {agent_id: state} dict, with units re-attached"""
+        column_units = column_units or {}
+        agents = {agent_id: {} for agent_id in self.agent_ids}
+        for path, (rows, values) in self.columns.items():
+            unit = column_units.get(path)
+            for row, value in zip(rows.tolist(), values.tolist()):
+                if unit is not None:
+                    value = [v * unit for v in value] if isinstance(value, list) else value * unit
+                assoc_path(agents[self.agent_ids[row]], path, value)
+        return agents
+
+
+class ArrayEmitter(RAMEmitter):
+    """
+    Emitter that stores the agents of each emit as an `AgentTable`, and everything else like
+    vivarium's RAMEmitter ("timeseries").
+
+    Config:
+        * **agents_path** (tuple): path to the agents store in the emitted data.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.agents_path = tuple(config.get('agents_path', AGENTS_PATH))
+        self.agent_tables = {}
+        self.column_units = {}
+
+    def emit(self, data):
+        if data['table'] != 'history':
+            return super().emit(data)
+
+        emit_data, agents = pop_agents(data['data'], self.agents_path)
+        if agents is None:
+            return super().emit(data)
+
+        self.agent_tables[emit_data['time']] = AgentTable(agents, self.column_units)
+        super().emit({'table': 'history', 'data': emit_data})
+
+    def get_agent_table(self, time):
+        """get the `AgentTable` emitted at `time`"""
+        return self.agent_tables[time]
+
+    def get_data(self, query=None):
+        data = super().get_data(query)
+        if query is not None:
+            return data
+
+        # rebuild the nested agents for each time
+        data = dict(data)
+        for time, table in self.agent_tables.items():
+            agents = table.to_dict(self.column_units)
+            data[time] = put_agents(data.get(time, {}), self.embed_path + self.agents_path, agents)
+        return data
+
+
+class DeltaEmitter(RAMEmitter):
+    """
+    Emitter that stores the agents of each emit as the changes from the previous emit, and everything
+    else like vivarium's RAMEmitter ("timeseries"). The full agents are rebuilt by `get_data`.
+
+    Config:
+        * **agents_path** (tuple): path to the agents store in the emitted data.
+        * **tolerance** (float): float variables that change by no more than this are not stored.
+          The default of 0 keeps every change, so the rebuilt data is the same as the emitted data.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.agents_path = tuple(config.get('agents_path', AGENTS_PATH))
+        self.tolerance = config.get('tolerance', 0.0)
+        self.agent_deltas = {}
+        self.previous_agents = {}
+
+    def emit(self, data):
+        if data['table'] != 'history':
+            return super().emit(data)
+
+        emit_data, agents = pop_agents(data['data'], self.agents_path)
+        if agents is None:
+            return super().emit(data)
+
+        # agent ids are the first element of each path, so removed agents remove all of their paths
+        flat_agents = dict(flatten_paths(agents))
+        self.agent_deltas[emit_data['time']] = diff_paths(
+            self.previous_agents, flat_agents, self.tolerance)
+        self.previous_agents = flat_agents
+        super().emit({'table': 'history', 'data': emit_data})
+
+    def get_data(self, query=None):
+        data = super().get_data(query)
+        if query is not None:
+            return data
+
+        # replay the deltas in emit order
+        data = dict(data)
+        flat_agents = {}
+        for time, (changed, removed) in self.agent_deltas.items():
+            for path in removed:
+                del flat_agents[path]
+            flat_agents.update(changed)
+            data[time] = put_agents(
+                data.get(time, {}), self.embed_path + self.agents_path, nest_paths(flat_agents))
+        return data
+
+
+def iter_database_data(experiment_id, db, batch_size=256, deserialize=True):
+    """
+    iterate over the history of an experiment in a database emitter's `db`, as (time, time_data)
+    pairs in time order. The documents are read from the cursor in batches of `batch_size`, and
+    the data is deserialized one time point at a time, so the whole history is never held at once.
+    Documents that the emitter broke down into pieces are merged back together. With
+    `deserialize=False`, the time points are yielded as stored, like `data_from_database` returns them.
+    """
+    finish = deserialize_value if deserialize else (lambda value: value)
+    cursor = db.history.find(
+        {'experiment_id': experiment_id},
+        {'data': 1}).sort('data.time', 1).batch_size(batch_size)
+    current_time = None
+    time_data = {}
+    for document in cursor:
+        data = dict(document['data'])
+        time = data.pop('time', None)
+        if time_data and time != current_time:
+            yield current_time, finish(time_data)
+            time_data = {}
+        current_time = time
+        deep_merge(time_data, data)
+    if time_data:
+        yield current_time, finish(time_data)
+
+
+def import_pyarrow():
+    """import pyarrow, which is only required by the parquet emitter"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            'the "parquet" emitter requires pyarrow, install it with: '
+            'pip install tumor-tcell[parquet]') from error
+    return pyarrow
+
+
+def read_trajectories(path):
+    """read the trajectories written by a `ParquetEmitter` into a pandas DataFrame"""
+    pyarrow = import_pyarrow()
+    return pyarrow.parquet.read_table(path).to_pandas()
+
+
+def trajectories_to_agents(trajectories, unit=1, times=None):
+    """
+    rebuild the agents of each time from trajectories, such as those written by a `ParquetEmitter`.
+    `trajectories` is a pandas DataFrame or a pyarrow Table. Returns {time: {agent_id: state}},
+    only for `times` if they are given.
+    """
+    if hasattr(trajectories, 'to_pandas'):
+        trajectories = trajectories.to_pandas()
+    if times is not None:
+        trajectories = trajectories[trajectories['time'].isin(times)]
+    agents = {}
+    for time, rows in trajectories.groupby('time', sort=False):
+        agents[float(time)] = {
+            agent_id: {
+                'boundary': {
+                    'location': [x * unit, y * unit],
+                    'diameter': diameter * unit},
+                'internal': {
+                    'cell_state': CELL_STATES[code] if code >= 0 else None}}
+            for agent_id, x, y, diameter, code in zip(
+                rows['agent_id'].tolist(), rows['x'].tolist(), rows['y'].tolist(),
+                rows['diameter'].tolist(), rows['cell_state'].tolist())}
+    return agents
+
+
+class ParquetEmitter(RAMEmitter):
+    """
+    Emitter that writes agent trajectories to a Parquet dataset, with one row per agent per emit,
+    and keeps everything else like vivarium's RAMEmitter ("timeseries").
+
+    Only the agents' location, diameter and cell_state are stored, with float32 positions and diameters,
+    so the agents rebuilt by `get_data` have none of their other variables, such as external, receive,
+    transfer, or death. This is enough for snapshots and videos, but not for `plots_suite`'s multigen
+    plots or `data_process.data_to_dataframes`.
+
+    Config:
+        * **path** (str): directory of the Parquet dataset. Each row group is written as a file in it.
+          Defaults to ``out/experiments/<experiment_id>_trajectories``.
+        * **agents_path** (tuple): path to the agents store in the emitted data.
+        * **row_group_size** (int): number of rows that are buffered before they are written.
+        * **compression** (str): Parquet compression codec.
+        * **max_pending_writes** (int): row groups are written by a background thread, so the simulation
+          continues while they are compressed and written. Emits wait when this many writes are pending.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.pyarrow = import_pyarrow()
+        self.agents_path = tuple(config.get('agents_path', AGENTS_PATH))
+        self.row_group_size = config.get('row_group_size', 10000)
+        self.compression = config.get('compression', 'zstd')
+        self.path = config.get('path') or os.path.join(
+            EXPERIMENT_OUT_DIR, f"{config.get('experiment_id', 'experiment')}_trajectories")
+        os.makedirs(self.path, exist_ok=True)
+        # remove the parts of an earlier run, so they are not read with this one
+        for file_name in os.listdir(self.path):
+            if file_name.startswith('part-') and file_name.endswith('.parquet'):
+                os.remove(os.path.join(self.path, file_name))
+        self.n_parts = 0
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending_writes = deque()
+        self.max_pending_writes = config.get('max_pending_writes', 4)
+        self.length_unit = None
+        self.buffer = {
+            'time': [], 'agent_id': [], 'x': [], 'y': [], 'diameter': [], 'cell_state': []}
+
+    def emit(self, data):
+        if data['table'] != 'history':
+            return super().emit(data)
+
+        emit_data, agents = pop_agents(data['data'], self.agents_path)
+        if agents is None:
+            return super().emit(data)
+
+        time = emit_data['time']
+        buffer = self.buffer
+        for agent_id, state in agents.items():
+            location, unit = strip_units(get_path(state, LOCATION_PATH, [np.nan, np.nan]))
+            diameter, _ = strip_units(get_path(state, DIAMETER_PATH, np.nan))
+            if self.length_unit is None and unit is not None:
+                self.length_unit = unit
+            buffer['time'].append(time)
+            buffer['agent_id'].append(agent_id)
+            buffer['x'].append(location[0])
+            buffer['y'].append(location[1])
+            buffer['diameter'].append(diameter)
+            buffer['cell_state'].append(
+                CELL_STATE_CODES.get(get_path(state, CELL_STATE_PATH), UNKNOWN_CELL_STATE))
+        if len(buffer['time']) >= self.row_group_size:
+            self.flush()
+
+        super().emit({'table': 'history', 'data': emit_data})
+
+    def flush(self):
+        """write the buffered rows as a new file in the dataset, in the background"""
+        if not self.buffer['time']:
+            return
+        pa = self.pyarrow
+        table = pa.table({
+            'time': pa.array(self.buffer['time'], type=pa.float64()),
+            'agent_id': pa.array(self.buffer['agent_id'], type=pa.string()),
+            'x': pa.array(self.buffer['x'], type=pa.float32()),
+            'y': pa.array(self.buffer['y'], type=pa.float32()),
+            'diameter': pa.array(self.buffer['diameter'], type=pa.float32()),
+            'cell_state': pa.array(self.buffer['cell_state'], type=pa.int8()),
+        })
+        part_path = os.path.join(self.path, f'part-{self.n_parts:05d}.parquet')
+        self.n_parts += 1
+        for column in self.buffer.values():
+            column.clear()
+
+        # bound the number of tables held by pending writes
+        while len(self.pending_writes) >= self.max_pending_writes:
+            self.pending_writes.popleft().result()
+        self.pending_writes.append(self.writer.submit(
+            pa.parquet.write_table, table, part_path, compression=self.compression))
+
+    def wait_for_writes(self):
+        """block until all pending writes are done, raising any of their errors"""
+        while self.pending_writes:
+            self.pending_writes.popleft().result()
+
+    def get_data(self, query=None):
+        # rebuild the agents from the trajectories before a query is applied, so that
+        # queries for the agents' paths find them
+        data = super().get_data()
+        self.flush()
+        self.wait_for_writes()
+        if self.n_parts:
+            unit = self.length_unit if self.length_unit is not None else 1
+            data = dict(data)
+            trajectories = read_trajectories(self.path)
+            for time, agents in trajectories_to_agents(trajectories, unit).items():
+                data[time] = put_agents(data.get(time, {}), self.embed_path + self.agents_path, agents)
+        if query is not None:
+            return query_data(data, query)
+        return data
+
+
+class BufferedDatabaseEmitter(DatabaseEmitter):
+    """
+    Emitter that writes to MongoDB like vivarium's DatabaseEmitter ("database"), but off the simulation's
+    critical path. History emits are collected in batches, and each batch is written by a background thread.
+    `close` writes the remaining emits and waits for them, and is called by `tumor_tcell_abm` when the
+    simulation ends, so that the whole history can be read from the database elsewhere. `get_data`
+    also writes the remaining emits before reading.
+
+    The emits of a batch are built into documents like DatabaseEmitter's, serialized with orjson, encoded
+    to BSON once, and inserted with one `insert_many` as raw BSON documents, which pymongo sends without
+    encoding them again. Emits that are too large for one document are written by DatabaseEmitter's
+    `write_emit`, which breaks them down into several documents.
+
+    Config:
+        * **batch_size** (int): number of emits that are collected before they are written.
+        * **max_pending_writes** (int): emits wait when this many batches are waiting to be written,
+          which bounds the memory held by the batches.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.batch_size = config.get('batch_size', 100)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending_writes = deque()
+        self.max_pending_writes = config.get('max_pending_writes', 4)
+        self.batch = []
+
+    def emit(self, data):
+        if data['table'] != 'history':
+            return super().emit(data)
+        self.batch.append(data)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def history_emit_data(self, data):
+        """
+        the history document of `data`, as DatabaseEmitter's `emit` builds it: the data is nested under
+        the embed path, with the time kept at the top level, and tagged with the experiment id
+        """
+        emit_data = dict(data['data'])
+        time = emit_data.pop('time', None)
+        if self.embed_path:
+            emit_data = put_agents({}, tuple(self.embed_path), emit_data)
+        if time is not None:
+            emit_data['time'] = time
+        emit_data['experiment_id'] = self.experiment_id
+        return emit_data
+
+    def write_batch(self, batch):
+        """write a batch of history emits, with the documents inserted together"""
+        documents = []
+        for data in batch:
+            emit_data = self.history_emit_data(data)
+            document = serialize_value(emit_data, self.fallback_serializer)
+            document['assembly_id'] = str(uuid.uuid4())
+            raw_document = bson_encode(document)
+            if len(raw_document) < MAX_DOCUMENT_SIZE:
+                documents.append(RawBSONDocument(raw_document))
+            else:
+                self.write_emit(self.history, emit_data)
+        if documents:
+            self.history.insert_many(documents)
+
+    def flush(self):
+        """write the collected emits in the background"""
+        if not self.batch:
+            return
+        batch = self.batch
+        self.batch = []
+        while len(self.pending_writes) >= self.max_pending_writes:
+            self.pending_writes.popleft().result()
+        self.pending_writes.append(self.writer.submit(self.write_batch, batch))
+
+    def wait_for_writes(self):
+        """block until all pending writes are done, raising any of their errors"""
+        while self.pending_writes:
+            self.pending_writes.popleft().result()
+
+    def close(self):
+        """write the remaining emits, including a last partial batch, and wait until they are written"""
+        self.flush()
+        self.wait_for_writes()
+
+    def get_data(self, query=None):
+        self.close()
+        return super().get_data(query)
+
+
+emitter_registry.register('array', ArrayEmitter)
+emitter_registry.register('parquet', ParquetEmitter)
+emitter_registry.register('delta', DeltaEmitter)
+emitter_registry.register('buffered_database', BufferedDatabaseEmitter)
+
+
+def test_agent_table():
+    agents = {
+        'tcell_0': {
+            'boundary': {'location': [1.0, 2.0], 'diameter': 7.5, 'death': False},
+            'internal': {'cell_state': 'PD1n'}},
+        'tumor_0': {
+            'boundary': {'location': [3.0, 4.0], 'diameter': 15.0, 'death': 'apoptosis'},
+            'internal': {'cell_state': 'PDL1p'},
+            'neighbors': {'receive': {'cytotoxic_packets': 3}}},
+    }
+    table = AgentTable(agents, {})
+    assert len(table) == 2
+    assert table.columns[('boundary', 'location')][1].shape == (2, 2)
+    agent_ids, packets = table.column(('neighbors', 'receive', 'cytotoxic_packets'))
+    assert agent_ids == ['tumor_0'] and packets.tolist() == [3]
+    assert table.to_dict() == agents
+
+
+def test_deserialize_unitless():
+    data = {
+        'diameter': '!units[7.5 micrometer]',
+        'count': '!units[3 dimensionless]',
+        'location': ['!units[1.0 micrometer]', '!units[2.0 micrometer]'],
+        'field': '!units[[1. 2.] micrometer]',
+        'cell_state': 'PD1n'}
+    unitless = deserialize_unitless(data)
+    assert unitless['diameter'] == 7.5
+    assert unitless['count'] == 3 and isinstance(unitless['count'], int)
+    assert unitless['location'] == [1.0, 2.0]
+    assert np.asarray(unitless['field']).tolist() == [1.0, 2.0]
+    assert unitless['cell_state'] == 'PD1n'
+
+
+def test_query_data():
+    data = {
+        0.0: {'fields': {'IFNg': [0.0]}, 'tumor_environment': {'agents': {
+            'tcell_0': {'boundary': {'location': [1.0, 2.0], 'diameter': 7.5}}}}},
+        60.0: {'fields': {'IFNg': [0.5]}, 'tumor_environment': {'agents': {}}}}
+    queried = query_data(data, [('tumor_environment', 'agents', 'tcell_0', 'boundary', 'location')])
+    assert queried == {
+        0.0: {'tumor_environment': {'agents': {'tcell_0': {'boundary': {'location': [1.0, 2.0]}}}}},
+        60.0: {}}
+
+
+def test_diff_paths():
+    emits = [
+        {'tcell_0': {'boundary': {'location': [1.0, 2.0], 'diameter': 7.5}}},
+        {'tcell_0': {'boundary': {'location': [1.5, 2.0], 'diameter': 7.5}},
+         'tcell_1': {'boundary': {'location': [4.0, 4.0], 'diameter': 7.5}}},
+        {'tcell_1': {'boundary': {'location': [4.0, 4.0], 'diameter': 8.0}}},
+    ]
+    previous = {}
+    flat_agents = {}
+    deltas = []
+    for agents in emits:
+        current = dict(flatten_paths(agents))
+        changed, removed = diff_paths(previous, current)
+        deltas.append((changed, removed))
+        previous = current
+
+        # replaying the deltas gives back the emitted agents
+        for path in removed:
+            del flat_agents[path]
+        flat_agents.update(changed)
+        assert nest_paths(flat_agents) == agents
+
+    assert deltas[1][0] == {
+        ('tcell_0', 'boundary', 'location'): [1.5, 2.0],
+        ('tcell_1', 'boundary', 'location'): [4.0, 4.0],
+        ('tcell_1', 'boundary', 'diameter'): 7.5}
+    assert deltas[2] == (
+        {('tcell_1', 'boundary', 'diameter'): 8.0},
+        [('tcell_0', 'boundary', 'location'), ('tcell_0', 'boundary', 'diameter')])
+
+    # changes within the tolerance are not stored
+    changed, _ = diff_paths({('a',): 1.0}, {('a',): 1.0 + 1e-9}, tolerance=1e-6)
+    assert changed == {}
+
+
+if __name__ == '__main__':
+    test_agent_table()
+    test_deserialize_unitless()
+    test_query_data()
+    test_diff_paths()
@@ -2,19 +2,18 @@ import vivarium
 import os
 import pickle
 from tumor_tcell.library.individual_analysis import individual_analysis
-from vivarium.library.units import remove_units
-from vivarium.core.emitter import deserialize_value, DatabaseEmitter
+from vivarium.core.emitter import assemble_data
+from tumor_tcell.library.emitters import iter_database_data
 
 
 def get_data_fromdb(experiment_id='', save_dir=None, analyze=True, bounds=[1200, 1200]):
     db = vivarium.core.emitter.get_experiment_database()
-    data = vivarium.core.emitter.data_from_database(experiment_id=experiment_id, client=db)
-    # data = deserialize_value(data)
-    # emitter = DatabaseEmitter(dict(experiment_id=experiment_id))
-    # emitter.client = db
-    # data = emitter.get_data()
-    data_export = data[0]
-    config_export = data[1]
+    experiment_configs = assemble_data(list(db.configuration.find({'experiment_id': experiment_id})))
+    # the exported history is still held whole, since it is pickled as one {time: data} dict, but the
+    # documents are read from the cursor in batches and merged as they arrive, rather than first listing
+    # all of them and then assembling a second copy of the history
+    data_export = dict(iter_database_data(experiment_id, db, deserialize=False))
+    config_export = list(experiment_configs.values())[0]
 
     # Specify the directory path to save the file
     if save_dir is None:
@@ -27,16 +26,16 @@ def get_data_fromdb(experiment_id='', save_dir=None, analyze=True, bounds=[1200,
     # Save the file with the full path
     data_path = os.path.join(save_dir, "data_export.pkl")
     with open(data_path, "wb") as file:
-        pickle.dump(data_export, file)
+        pickle.dump(data_export, file, protocol=pickle.HIGHEST_PROTOCOL)
 
     file_path = os.path.join(save_dir, "config_export.pkl")
     with open(file_path, "wb") as file:
-        pickle.dump(config_export, file)
+        pickle.dump(config_export, file, protocol=pickle.HIGHEST_PROTOCOL)
 
     if analyze==True:
         individual_analysis(analysis_dir=home_dir, experiment_id=experiment_id, bounds=bounds, tcells=True, lymph_nodes=True)
 
-    return data
+    return data_export, config_export
 
 
 if __name__ == '__main__':
@@ -1,5 +1,8 @@
 import math
-import random
+from functools import lru_cache
+
+import numpy as np
+from scipy.spatial import cKDTree
 
 from vivarium.library.units import units
 
@@ -7,6 +10,25 @@ from vivarium.library.units import units
 PI = math.pi
 
 
+@lru_cache(maxsize=None)
+def conversion_factor(from_unit, to_unit):
+    """the factor that converts a magnitude in `from_unit` to `to_unit`"""
+    return (1 * from_unit).to(to_unit).magnitude
+
+
+def magnitude_as(value, unit):
+    """
+    get the magnitude of a Quantity in `unit`. This is equivalent to `value.to(unit).magnitude`,
+    but the conversion factor between each pair of units is only computed once, which keeps
+    pint out of the per-agent loops of the processes. A plain number is taken to already be in `unit`,
+    so states that were stripped of their units pass straight through.
+    """
+    try:
+        return value.magnitude * conversion_factor(value.units, unit)
+    except AttributeError:
+        return value
+
+
 def random_location(
         bounds,
         center=None,
@@ -17,46 +39,200 @@ def random_location(
     generate a single random location within `bounds`, and within `distance_from_center`
     of a provided `center`. `excluded_distance_from_center` is an additional parameter
     that leaves an empty region around the center point.
+
+    This draws one location with `random_locations`. To place many agents, call `random_locations`
+    once for all of them, which draws their coordinates together.
     """
-    if distance_from_center and excluded_distance_from_center:
-        assert distance_from_center > excluded_distance_from_center, \
-            'distance_from_center must be greater than excluded_distance_from_center'
+    return random_locations(
+        1,
+        bounds,
+        center=center,
+        distance_from_center=distance_from_center,
+        excluded_distance_from_center=excluded_distance_from_center)[0]
 
-    # get the center
-    if center:
-        center_x = center[0]
-        center_y = center[1]
-    else:
-        center_x = bounds[0]/2
-        center_y = bounds[1]/2
 
+def draw_locations(
+        number,
+        bound_x,
+        bound_y,
+        center_x,
+        center_y,
+        distance_from_center=None,
+        excluded_distance_from_center=None,
+        rng=None,
+):
+    """
+    draw the unitless (pos_x, pos_y) arrays of `number` random locations for `random_locations`,
+    with the numpy random generator `rng`, or with numpy's global random state if it is None
+    """
+    rng = np.random if rng is None else rng
     if distance_from_center:
         if excluded_distance_from_center:
             ring_size = distance_from_center - excluded_distance_from_center
-            distance = excluded_distance_from_center + ring_size * math.sqrt(random.random())
+            distance = excluded_distance_from_center + ring_size * np.sqrt(rng.random(number))
         else:
-            distance = distance_from_center * math.sqrt(random.random())
+            distance = distance_from_center * np.sqrt(rng.random(number))
 
-        angle = random.uniform(0, 2 * PI)
-        dy = math.sin(angle)*distance
-        dx = math.cos(angle)*distance
-        pos_x = center_x+dx
-        pos_y = center_y+dy
+        angle = rng.uniform(0, 2 * PI, number)
+        pos_x = center_x + np.cos(angle) * distance
+        pos_y = center_y + np.sin(angle) * distance
 
     elif excluded_distance_from_center:
-        in_center = True
-        while in_center:
-            pos_x = random.uniform(0, bounds[0])
-            pos_y = random.uniform(0, bounds[1])
-            distance = (pos_x**2 + pos_y**2)**0.5
-            if distance > excluded_distance_from_center:
-                in_center = False
+        assert excluded_distance_from_center < (bound_x ** 2 + bound_y ** 2) ** 0.5, \
+            'excluded_distance_from_center must leave part of the bounds for the locations'
+        # draw batches, and keep the locations outside of the excluded distance until there are enough.
+        # after the first batch, the batches are sized by the fraction of locations that were kept,
+        # so a large excluded region takes a few large batches rather than many small ones.
+        # every location outside of the excluded distance is past these minimums, so the draws are
+        # made in that part of the bounds, which keeps more of them without changing the distribution
+        min_x = math.sqrt(max(excluded_distance_from_center ** 2 - bound_y ** 2, 0))
+        min_y = math.sqrt(max(excluded_distance_from_center ** 2 - bound_x ** 2, 0))
+        kept_x = [np.empty(0)]
+        kept_y = [np.empty(0)]
+        n_kept = 0
+        n_drawn = 0
+        batch_size = number
+        while n_kept < number:
+            batch_x = rng.uniform(min_x, bound_x, batch_size)
+            batch_y = rng.uniform(min_y, bound_y, batch_size)
+            outside = (batch_x ** 2 + batch_y ** 2) ** 0.5 > excluded_distance_from_center
+            kept_x.append(batch_x[outside])
+            kept_y.append(batch_y[outside])
+            n_kept += int(outside.sum())
+            n_drawn += batch_size
+            kept_fraction = max(n_kept, 1) / n_drawn
+            batch_size = math.ceil(1.1 * (number - n_kept) / kept_fraction)
+        pos_x = np.concatenate(kept_x)[:number]
+        pos_y = np.concatenate(kept_y)[:number]
     else:
-        pos_x = random.uniform(0, bounds[0])
-        pos_y = random.uniform(0, bounds[1])
+        pos_x = rng.uniform(0, bound_x, number)
+        pos_y = rng.uniform(0, bound_y, number)
+    return pos_x, pos_y
 
-    return [pos_x, pos_y]
+
+def random_locations(
+        number,
+        bounds,
+        center=None,
+        distance_from_center=None,
+        excluded_distance_from_center=None,
+        min_distance=None,
+        max_redraws=20,
+        rng=None,
+        as_array=False,
+):
+    """
+    generate `number` random locations, with the same distribution as `random_location`.
+    The coordinates are drawn with numpy for all locations at once, and if `bounds` has units,
+    the locations are returned with the same units.
+
+    If `min_distance` is given, locations that are closer than `min_distance` to another location
+    are redrawn, up to `max_redraws` times. The close pairs are found with a KD-tree. If the region
+    is too packed to place every location apart, the remaining overlaps are kept. The redraws make
+    the locations slightly more even than the uniform disk or ring they are drawn from.
+
+    `rng` is a numpy random generator, such as `np.random.default_rng(seed)`, for reproducible
+    locations. If it is None, numpy's global random state is used.
+
+    The locations are returned as a list of [x, y] pairs. With `as_array`, they are instead returned
+    as a single (number, 2) array, which is a Quantity array if `bounds` has units. This skips
+    building a Quantity for each coordinate when the caller works on the locations as an array.
+    """
+    if distance_from_center and excluded_distance_from_center:
+        assert distance_from_center > excluded_distance_from_center, \
+            'distance_from_center must be greater than excluded_distance_from_center'
+
+    unit = getattr(bounds[0], 'units', None)
+
+    def magnitude(value):
+        if unit is not None and hasattr(value, 'units'):
+            return magnitude_as(value, unit)
+        return value
+
+    bound_x = magnitude(bounds[0])
+    bound_y = magnitude(bounds[1])
+
+    # get the center
+    if center:
+        center_x = magnitude(center[0])
+        center_y = magnitude(center[1])
+    else:
+        center_x = bound_x / 2
+        center_y = bound_y / 2
+
+    draw_config = dict(
+        bound_x=bound_x,
+        bound_y=bound_y,
+        center_x=center_x,
+        center_y=center_y,
+        distance_from_center=magnitude(distance_from_center),
+        excluded_distance_from_center=magnitude(excluded_distance_from_center),
+        rng=rng)
+    pos_x, pos_y = draw_locations(number, **draw_config)
+
+    # redraw one location of each pair that is too close
+    if min_distance and number > 1:
+        min_distance = magnitude(min_distance)
+        for _ in range(max_redraws):
+            pairs = cKDTree(np.column_stack([pos_x, pos_y])).query_pairs(min_distance, output_type='ndarray')
+            if not len(pairs):
+                break
+            redraw = np.unique(pairs[:, 1])
+            pos_x[redraw], pos_y[redraw] = draw_locations(len(redraw), **draw_config)
+
+    if as_array:
+        locations = np.column_stack([pos_x, pos_y])
+        if unit is not None:
+            return units.Quantity(locations, unit)
+        return locations
+
+    if unit is not None:
+        # constructing the Quantities directly is much faster than multiplying by the unit
+        quantity = units.Quantity
+        return [[quantity(x, unit), quantity(y, unit)] for x, y in zip(pos_x.tolist(), pos_y.tolist())]
+    return [[x, y] for x, y in zip(pos_x.tolist(), pos_y.tolist())]
 
 
 DEFAULT_LENGTH_UNIT = units.um
 DEFAULT_BOUNDS = [200 * DEFAULT_LENGTH_UNIT, 200 * DEFAULT_LENGTH_UNIT]
+
+
+def test_random_locations_excluded(number=20000, seed=0):
+    """
+    drawing in the part of the bounds past the excluded distance gives the same distribution as
+    drawing in all of the bounds and rejecting the locations within the excluded distance
+    """
+    bounds = [100, 50]
+    excluded = 80
+    locations = random_locations(
+        number, bounds, excluded_distance_from_center=excluded, rng=np.random.default_rng(seed), as_array=True)
+    assert locations.shape == (number, 2)
+    assert np.all((locations >= 0) & (locations <= bounds))
+    assert np.all(np.hypot(locations[:, 0], locations[:, 1]) > excluded)
+
+    rng = np.random.default_rng(seed + 1)
+    rejected = rng.uniform(0, 1, (20 * number, 2)) * bounds
+    rejected = rejected[np.hypot(rejected[:, 0], rejected[:, 1]) > excluded][:number]
+    assert np.allclose(locations.mean(axis=0), rejected.mean(axis=0), atol=0.5)
+    assert np.allclose(locations.std(axis=0), rejected.std(axis=0), atol=0.5)
+
+
+def test_random_locations_min_distance(number=100, min_distance=5.0, seed=0):
+    """the close locations are redrawn apart, and a packed region still gets every location"""
+    bounds = [200, 200]
+    locations = random_locations(
+        number, bounds, min_distance=min_distance, rng=np.random.default_rng(seed), as_array=True)
+    distances = np.hypot(*(locations[:, None] - locations[None]).transpose(2, 0, 1))
+    assert np.all(distances[np.triu_indices(number, 1)] >= min_distance)
+    assert np.all((locations >= 0) & (locations <= bounds))
+    assert np.array_equal(locations, random_locations(
+        number, bounds, min_distance=min_distance, rng=np.random.default_rng(seed), as_array=True))
+
+    packed = random_locations(
+        number, [20, 20], min_distance=min_distance, rng=np.random.default_rng(seed), as_array=True)
+    assert packed.shape == (number, 2)
+
+
+if __name__ == '__main__':
+    test_random_locations_excluded()
+    test_random_locations_min_distance()
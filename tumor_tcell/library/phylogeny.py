@@ -1,14 +1,13 @@
-import itertools
-
 def get_phylogeny(agent_ids):
   # agent_ids: list of string values
   # make phylogeny with {mother_id: [daughter_1_id, daughter_2_id]}
+  # a daughter's id is its mother's id with one more character, so each id is checked
+  # against its own prefix in one pass, rather than comparing every pair of ids
   phylogeny = {agent_id: [] for agent_id in agent_ids}
-  for agent1, agent2 in itertools.combinations(agent_ids, 2):
-      if agent1 == agent2[0:-1]:
-          phylogeny[agent1].append(agent2)
-      elif agent2 == agent1[0:-1]:
-          phylogeny[agent2].append(agent1)
+  for agent_id in agent_ids:
+      mother_id = agent_id[0:-1]
+      if mother_id in phylogeny:
+          phylogeny[mother_id].append(agent_id)
   return phylogeny
 
 
@@ -17,3 +16,16 @@ def daughter_ab(mother_id):
         str(mother_id) + "A",
         str(mother_id) + "B"
     ]
+
+
+def test_get_phylogeny():
+    """the prefix lookup builds the same phylogeny as comparing every pair of ids"""
+    import itertools
+    agent_ids = ['tumor_0', 'tumor_0A', 'tcell_1B', 'tumor_0B', 'tcell_1', 'tumor_0AB', 'tcell_1BA', 'tumor_0AA']
+    expected = {agent_id: [] for agent_id in agent_ids}
+    for agent1, agent2 in itertools.combinations(agent_ids, 2):
+        if agent1 == agent2[0:-1]:
+            expected[agent1].append(agent2)
+        elif agent2 == agent1[0:-1]:
+            expected[agent2].append(agent1)
+    assert get_phylogeny(agent_ids) == expected
@@ -1,54 +1,80 @@
-from collections import Counter
-from tumor_tcell.library.phylogeny import get_phylogeny
-import pandas as pd
-
-
-def division_analysis(cell_plot):
-    #############################3
-    # How to extract individual T cells
-    df_divide_T = cell_plot.drop_duplicates('cell', keep='first')
-
-    # Get unique agent IDs
-    unique_T_cell = list(df_divide_T.cell.unique())
-
-    # run phylogeny function
-    phylogeny_T = get_phylogeny(unique_T_cell)
-
-    # get initial ancestors, daughters, and mothers
-    daughters_T = list(phylogeny_T.values())
-    daughters_T = set([item for sublist in daughters_T for item in sublist])
-    descendents_T = list(daughters_T)
-    mothers_T = set(list(phylogeny_T.keys()))
-    ancestors_T = list(mothers_T - daughters_T)
-
-    # Time for plotting cell divisions
-    div_list_T = []
-    for cell in descendents_T:
-        div = df_divide_T[df_divide_T["cell"] == cell]['time'].min()
-        div_list_T.append(div)
-
-    # get unique counts from the list
-    div_counts_T = Counter(div_list_T)
-    divide_time_T = pd.DataFrame.from_dict(div_counts_T, orient='index').reset_index()
-
-    if not divide_time_T.empty:
-
-        # convert to dataframe
-        column_names = ['time', 'counts']
-        divide_time_T.columns = column_names
-
-        # divide counts by 2 because each daughter and original cell is counted twice
-        divide_time_T['counts'] = divide_time_T['counts'] / 2
-
-        # add 0, 0 initial point
-        divide_time_T.loc[-1] = [0, 0]
-        divide_time_T.index = divide_time_T.index + 1  # shifting index
-        divide_time_T = divide_time_T.sort_values(by='time')
-
-        # accumulate the counts as progresses
-        divide_time_T['total_division'] = divide_time_T.counts.cumsum()
-
-    else:
-        divide_time_T = pd.DataFrame()
-
-    return divide_time_T
\ No newline at end of file
+import itertools
+from tumor_tcell.library.phylogeny import get_phylogeny
+import numpy as np
+import pandas as pd
+
+
+def division_analysis(cell_plot):
+    #############################3
+    # How to extract individual T cells
+    df_divide_T = cell_plot.drop_duplicates('cell', keep='first')
+
+    # Get unique agent IDs
+    unique_T_cell = list(df_divide_T.cell.unique())
+
+    # run phylogeny function
+    phylogeny_T = get_phylogeny(unique_T_cell)
+
+    # get initial ancestors, daughters, and mothers
+    daughters_T = set(itertools.chain.from_iterable(phylogeny_T.values()))
+    mothers_T = set(list(phylogeny_T.keys()))
+    ancestors_T = list(mothers_T - daughters_T)
+
+    # Time for plotting cell divisions, from the first time of each cell, for all the descendents at once
+    first_times_T = df_divide_T.groupby('cell')['time'].min()
+    div_times_T = first_times_T.reindex(list(daughters_T)).to_numpy()
+
+    # get unique counts of the times, and convert to dataframe. np.unique would merge the missing
+    # times into one, so each of them is counted on its own, as a Counter of the times did
+    missing_T = pd.isna(div_times_T)
+    times_T, counts_T = np.unique(div_times_T[~missing_T], return_counts=True)
+    divide_time_T = pd.DataFrame({
+        'time': np.concatenate([times_T, div_times_T[missing_T]]),
+        'counts': np.concatenate([counts_T, np.ones(missing_T.sum(), dtype=counts_T.dtype)])})
+
+    if not divide_time_T.empty:
+
+        # divide counts by 2 because each daughter and original cell is counted twice
+        divide_time_T['counts'] = divide_time_T['counts'] / 2
+
+        # add 0, 0 initial point
+        divide_time_T.loc[-1] = [0, 0]
+        divide_time_T.index = divide_time_T.index + 1  # shifting index
+        divide_time_T = divide_time_T.sort_values(by='time')
+
+        # accumulate the counts as progresses
+        divide_time_T['total_division'] = divide_time_T.counts.cumsum()
+
+    else:
+        divide_time_T = pd.DataFrame()
+
+    return divide_time_T
+
+
+def test_division_analysis():
+    """the divisions are counted as a Counter of the daughters' first times did, with each missing time apart"""
+    from collections import Counter
+    cell_plot = pd.DataFrame({
+        'cell': ['tcell_0', 'tcell_1', 'tcell_0A', 'tcell_0B', 'tcell_0A', 'tcell_1A', 'tcell_1B',
+                 'tcell_0AA', 'tcell_0AB', 'tcell_0BA'],
+        'time': [0.0, 0.0, 2.0, 2.0, 3.0, 4.5, np.nan, np.nan, 6.0, 6.0]})
+    divide_time = division_analysis(cell_plot)
+
+    # the division counts as they were made with a Counter
+    df_divide = cell_plot.drop_duplicates('cell', keep='first')
+    daughters = set(itertools.chain.from_iterable(get_phylogeny(list(df_divide.cell.unique())).values()))
+    div_counts = Counter(df_divide[df_divide['cell'] == cell]['time'].min() for cell in daughters)
+    expected = pd.DataFrame.from_dict(div_counts, orient='index').reset_index()
+    expected.columns = ['time', 'counts']
+    expected['counts'] = expected['counts'] / 2
+    expected.loc[-1] = [0, 0]
+    expected.index = expected.index + 1
+    expected = expected.sort_values(by='time')
+    expected['total_division'] = expected.counts.cumsum()
+
+    pd.testing.assert_frame_equal(
+        divide_time.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+if __name__ == '__main__':
+    test_division_analysis()
@@ -4,125 +4,99 @@ import matplotlib.pyplot as pl
 import os
 import numpy as np
 
-def division_plot(divide_data, out_dir = None, save_name = None):
-
-    #Import Plot settings
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
+# font sizes of the plots
+SMALL_SIZE = 18
+MEDIUM_SIZE = 22
+BIGGER_SIZE = 24
+PLOT_RC = {
+    'font.size': SMALL_SIZE,  # controls default text sizes
+    'axes.titlesize': SMALL_SIZE,  # fontsize of the axes title
+    'axes.labelsize': MEDIUM_SIZE,  # fontsize of the x and y labels
+    'xtick.labelsize': SMALL_SIZE,  # fontsize of the tick labels
+    'ytick.labelsize': SMALL_SIZE,  # fontsize of the tick labels
+    'legend.fontsize': SMALL_SIZE,  # legend fontsize
+    'figure.titlesize': BIGGER_SIZE,  # fontsize of the figure title
+}
+
+
+def set_plot_rc():
+    """apply the plot settings with one rcParams update"""
+    pl.rcParams.update(PLOT_RC)
 
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
 
+def division_plot(divide_data, out_dir = None, save_name = None):
+    set_plot_rc()
 
     #Plot number of T cell divisions
-    pl.figure(figsize=(8, 4))
-    div_cell_T = sns.lineplot(data=divide_data, x="time", y='total_division')
-    pl.title("# of divisions")
+    fig, ax = pl.subplots(figsize=(8, 4))
+    div_cell_T = sns.lineplot(data=divide_data, x="time", y='total_division', ax=ax)
+    ax.set_title("# of divisions")
     if save_name is not None:
-        pl.savefig(out_dir+'/'+save_name+'_division.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        fig.savefig(out_dir+'/'+save_name+'_division.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 def population_plot(population_data, cell_states, out_dir=None, save_name=None):
-    # Import Plot settings
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
+    set_plot_rc()
 
     # Plot total cells and see how changing over time
-    total_cell = population_data.groupby('time')['cell'].nunique().reset_index()
-    cell_state_df = population_data.groupby(['time', 'cell_state'])['cell'].nunique().reset_index()
-    state_1 = cell_state_df.loc[cell_state_df['cell_state'] == cell_states[0]]
-    state_2 = cell_state_df.loc[cell_state_df['cell_state'] == cell_states[1]]
-
-    # reset index
-    total_cell.reset_index(inplace=True, drop=True)
-    state_1.reset_index(inplace=True, drop=True)
-    state_2.reset_index(inplace=True, drop=True)
-
-    pl.figure(figsize=(8, 4))
-    ttl = sns.lineplot(data=total_cell, x="time", y='cell', label='total')
-    ttl_state1 = sns.lineplot(data=state_1, x="time", y='cell', label=cell_states[0])
-    ttl_state2 = sns.lineplot(data=state_2, x="time", y='cell', label=cell_states[1])
-
-    pl.title("Total "+save_name)
-    pl.legend(title="Cell type")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    # count the cells of each state at each time with one groupby. cells without a state are kept
+    # in their own column, so the row sums are the totals
+    state_counts = population_data.groupby(['time', 'cell_state'], dropna=False)['cell'].nunique().unstack()
+    total_cell = state_counts.sum(axis=1).rename('cell').reset_index()
+    state_counts = state_counts.reindex(columns=cell_states[:2])
+    state_1 = state_counts[cell_states[0]].dropna().rename('cell').reset_index()
+    state_2 = state_counts[cell_states[1]].dropna().rename('cell').reset_index()
+
+    fig, ax = pl.subplots(figsize=(8, 4))
+    ttl = sns.lineplot(data=total_cell, x="time", y='cell', label='total', ax=ax)
+    ttl_state1 = sns.lineplot(data=state_1, x="time", y='cell', label=cell_states[0], ax=ax)
+    ttl_state2 = sns.lineplot(data=state_2, x="time", y='cell', label=cell_states[1], ax=ax)
+
+    ax.set_title("Total "+save_name)
+    ax.legend(title="Cell type")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
     if save_name is not None:
-        pl.savefig(out_dir + '/' + save_name + '_total.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        fig.savefig(out_dir + '/' + save_name + '_total.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 
 def death_plot(death_data, out_dir=None, save_name=None):
-    # Import Plot settings
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
+    set_plot_rc()
 
     #Plot total number of deaths and type
     total_col = [col for col in death_data.columns if 'total' in col]
-    pl.figure(figsize=(8, 4))
+    fig, ax = pl.subplots(figsize=(8, 4))
     death_plot = pd.melt(death_data, id_vars= ['death', 'time'], value_vars= total_col)
     death_plot.rename(columns={'variable':'death type', 'value' : 'death count'}, inplace=True)
 
     # reset index
     death_plot.reset_index(inplace=True, drop=True)
 
-    death_cell = sns.lineplot(data=death_plot, x="time", y='death count', hue='death type')
-    pl.title("# of deaths")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    death_cell = sns.lineplot(data=death_plot, x="time", y='death count', hue='death type', ax=ax)
+    ax.set_title("# of deaths")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
 
     if save_name is not None:
-        pl.savefig(out_dir + '/' + save_name + '_death.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        fig.savefig(out_dir + '/' + save_name + '_death.png', transparent=True, format='png', bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 
 def death_group_plot(death_plot_list, out_dir=None, save_name=None):
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
-
-    death_plot_l = []
-    for experiment in death_plot_list:
-        # Plot total number of deaths and type
-        total_col = [col for col in experiment.columns if 'total' in col]
-        if len(experiment) > 1:
-            death_plot = pd.melt(experiment, id_vars=['death', 'time', 'experiment_name'], value_vars=total_col)
-            death_plot.rename(columns={'variable': 'death type', 'value': 'death count'}, inplace=True)
-            death_plot_l.append(death_plot)
+    set_plot_rc()
 
+    death_plot_l = [experiment for experiment in death_plot_list if len(experiment) > 1]
     if not death_plot_l:
         raise Warning('no death in these experiments, skipping death_group_plot')
         return
 
-    # Concatenate all
-    death_plot = pd.concat(death_plot_l)
+    # Concatenate all, and plot total number of deaths and type.
+    # experiments can have different death types, so the counts that are missing
+    # because an experiment does not have that column are dropped after melting
+    experiments = pd.concat(death_plot_l, ignore_index=True)
+    total_col = [col for col in experiments.columns if 'total' in col]
+    death_plot = pd.melt(experiments, id_vars=['death', 'time', 'experiment_name'], value_vars=total_col)
+    death_plot.rename(columns={'variable': 'death type', 'value': 'death count'}, inplace=True)
+    death_plot.dropna(subset=['death count'], inplace=True)
 
     # Separate out total death
     total_death_plot = death_plot.loc[death_plot['death type'] == 'total_death']
@@ -133,37 +107,29 @@ def death_group_plot(death_plot_list, out_dir=None, save_name=None):
     other_death_plot.reset_index(inplace=True, drop=True)
 
     # Plot figures
-    pl.figure(figsize=(8, 4))
-    death_cell = sns.lineplot(data=total_death_plot, x="time", y='death count', hue='experiment_name')
-    pl.title("# of deaths")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    fig, ax = pl.subplots(figsize=(8, 4))
+    death_cell = sns.lineplot(data=total_death_plot, x="time", y='death count', hue='experiment_name', ax=ax)
+    ax.set_title("# of deaths")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
     if save_name is not None:
-        pl.savefig(out_dir + '/' + save_name + '_death.png', transparent=True, format='png', bbox_inches='tight',
-                   dpi=300)
+        fig.savefig(out_dir + '/' + save_name + '_death.png', transparent=True, format='png', bbox_inches='tight',
+                    dpi=300)
+        pl.close(fig)
 
-    pl.figure(figsize=(8, 4))
+    fig, ax = pl.subplots(figsize=(8, 4))
     death_cell = sns.lineplot(data=other_death_plot, x="time", y='death count', hue='experiment_name',
-                              style='death type')
-    pl.title("# of deaths")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+                              style='death type', ax=ax)
+    ax.set_title("# of deaths")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
 
     if save_name is not None:
-        pl.savefig(out_dir + '/' + save_name + '_death_subtypes.png', transparent=True, format='png',
-                   bbox_inches='tight', dpi=300)
+        fig.savefig(out_dir + '/' + save_name + '_death_subtypes.png', transparent=True, format='png',
+                    bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 
 def population_group_plot(cell_plot_list, cell_states, out_dir=None, save_name=None):
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
+    set_plot_rc()
 
     # Plot total cells and see how changing over time
     experiment_plot_list = []
@@ -193,44 +159,36 @@ def population_group_plot(cell_plot_list, cell_states, out_dir=None, save_name=N
     cell_state_all.reset_index(inplace=True, drop=True)
 
     # Create plot
-    pl.figure(figsize=(8, 4))
-    ttl_1 = sns.lineplot(data=experiment_plot, x="time", y='cell', hue='experiment_name')
-    pl.title("Total " + save_name)
-    pl.legend(title="Experiment")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    fig, ax = pl.subplots(figsize=(8, 4))
+    ttl_1 = sns.lineplot(data=experiment_plot, x="time", y='cell', hue='experiment_name', ax=ax)
+    ax.set_title("Total " + save_name)
+    ax.legend(title="Experiment")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
 
     if save_name is not None:
         save_path = os.path.join(out_dir, save_name + '_total.png')
-        pl.savefig(save_path, transparent=True, format='png', bbox_inches='tight',
-                   dpi=300)
+        fig.savefig(save_path, transparent=True, format='png', bbox_inches='tight',
+                    dpi=300)
+        pl.close(fig)
 
     # Create plot
-    pl.figure(figsize=(8, 4))
-    ttl_2 = sns.lineplot(data=cell_state_all, x="time", y='cell', hue='experiment_name', style='cell_state')
-    pl.title("Total Subtype of " + save_name)
-    pl.legend(title="Experiment")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    fig, ax = pl.subplots(figsize=(8, 4))
+    ttl_2 = sns.lineplot(data=cell_state_all, x="time", y='cell', hue='experiment_name', style='cell_state', ax=ax)
+    ax.set_title("Total Subtype of " + save_name)
+    ax.legend(title="Experiment")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
 
     if save_name is not None:
         save_path = os.path.join(out_dir, save_name + '_total_subtype.png')
-        pl.savefig(save_path, transparent=True, format='png',
-                   bbox_inches='tight', dpi=300)
+        fig.savefig(save_path, transparent=True, format='png',
+                    bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 def cytotoxicity_group_plot(
         cell_plot_list, exp_1, cntrl_1, exp_2, cntrl_2,
         out_dir=None, save_name=None
 ):
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
+    set_plot_rc()
 
     # Combine data for comparisons
     experiment_plot_list = []
@@ -240,42 +198,27 @@ def cytotoxicity_group_plot(
     experiment_plot = pd.concat(experiment_plot_list)
 
     # Reshape the data for calculating cytotoxicity with controls
-    tt = experiment_plot.pivot(index='time', columns='experiment_name', values='cell').reset_index()
-    exp_1 = exp_1
-    cntrl_1 = cntrl_1
-    exp_2 = exp_2
-    cntrl_2 = cntrl_2
-    col_1 = ['time', exp_1, cntrl_1]
-    col_2 = ['time', exp_2, cntrl_2]
-    tt_1 = tt[col_1]
-    tt_2 = tt[col_2]
-
-    # calculate cytotoxicity with controls
-    tt_1['cytotoxicity'] = (tt_1[cntrl_1] - tt_1[exp_1]) / tt_1[cntrl_1] * 100
-    tt_2['cytotoxicity'] = (tt_2[cntrl_2] - tt_2[exp_2]) / tt_2[cntrl_2] * 100
-
-    # reshape data for plotting together
-    tm_1 = pd.melt(tt_1, id_vars='time', value_vars='cytotoxicity')
-    tm_1['experiment_name'] = exp_1
-    tm_1.rename(columns={'value': 'cytotoxicity'}, inplace=True)
-    tm_2 = pd.melt(tt_2, id_vars='time', value_vars='cytotoxicity')
-    tm_2['experiment_name'] = exp_2
-    tm_2.rename(columns={'value': 'cytotoxicity'}, inplace=True)
-    cytotoxic_plot = pd.concat([tm_1, tm_2])
+    tt = experiment_plot.pivot(index='time', columns='experiment_name', values='cell')
 
-    # reset index
-    cytotoxic_plot.reset_index(inplace=True, drop=True)
+    # calculate cytotoxicity with controls, directly in the long format for plotting together
+    cytotoxic_plot = pd.concat([
+        pd.DataFrame({
+            'time': tt.index,
+            'experiment_name': exp,
+            'cytotoxicity': ((tt[cntrl] - tt[exp]) / tt[cntrl] * 100).to_numpy()})
+        for exp, cntrl in [(exp_1, cntrl_1), (exp_2, cntrl_2)]], ignore_index=True)
 
     # Create plot
-    pl.figure(figsize=(8, 4))
-    ttl_1 = sns.lineplot(data=cytotoxic_plot, x="time", y='cytotoxicity', hue='experiment_name')
-    pl.title("Total " + save_name)
-    pl.legend(title="Experiment")
-    pl.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    fig, ax = pl.subplots(figsize=(8, 4))
+    ttl_1 = sns.lineplot(data=cytotoxic_plot, x="time", y='cytotoxicity', hue='experiment_name', ax=ax)
+    ax.set_title("Total " + save_name)
+    ax.legend(title="Experiment")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
 
     if save_name is not None:
         save_path = os.path.join(out_dir, save_name + '_cytotoxicity.png')
-        pl.savefig(save_path, transparent=True, format='png', bbox_inches='tight', dpi=300)
+        fig.savefig(save_path, transparent=True, format='png', bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
     return cytotoxic_plot
 
@@ -285,18 +228,7 @@ def cytotoxicity_rep_plot(
         save_name='cytotoxicity_rep_plot',
         analysis_dir='out/killing_experiments/'
 ):
-    #settings for the plotting
-    SMALL_SIZE = 18
-    MEDIUM_SIZE = 22
-    BIGGER_SIZE = 24
-
-    pl.rc('font', size=SMALL_SIZE)  # controls default text sizes
-    pl.rc('axes', titlesize=SMALL_SIZE)  # fontsize of the axes title
-    pl.rc('axes', labelsize=MEDIUM_SIZE)  # fontsize of the x and y labels
-    pl.rc('xtick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('ytick', labelsize=SMALL_SIZE)  # fontsize of the tick labels
-    pl.rc('legend', fontsize=SMALL_SIZE)  # legend fontsize
-    pl.rc('figure', titlesize=BIGGER_SIZE)  # fontsize of the figure title
+    set_plot_rc()
 
     # Get csv saved in experiment id library
     save_dir = analysis_dir + 'Multiple_killing_analysis/'
@@ -327,7 +259,7 @@ def cytotoxicity_rep_plot(
     dfb = dfb.rename_axis(None, axis=1)
     dfb.reset_index(inplace=True)
 
-    pl.figure(figsize=(8, 4))
+    fig, ax = pl.subplots(figsize=(8, 4))
     for experiment in dfb.experiment_name.unique():
         df_plot = dfb[dfb.experiment_name == experiment]
 
@@ -341,15 +273,16 @@ def cytotoxicity_rep_plot(
         df_plot.reset_index(inplace=True, drop=True)
 
         # Create plot
-        ttl_1 = sns.lineplot(data=df_plot, x="time", y='mean')
-        pl.title("Total " + save_name)
-        pl.ylabel('cytotoxicity')
-        pl.fill_between(df_plot['time'], lower_bound, upper_bound, alpha=.3)
+        ttl_1 = sns.lineplot(data=df_plot, x="time", y='mean', ax=ax)
+        ax.set_title("Total " + save_name)
+        ax.set_ylabel('cytotoxicity')
+        ax.fill_between(df_plot['time'], lower_bound, upper_bound, alpha=.3)
 
     #save the plot
     if save_name is not None:
-        pl.savefig(analysis_out_dir + '/' + save_name + '_cytotoxicity.png', transparent=True, format='png',
-                   bbox_inches='tight', dpi=300)
+        fig.savefig(analysis_out_dir + '/' + save_name + '_cytotoxicity.png', transparent=True, format='png',
+                    bbox_inches='tight', dpi=300)
+        pl.close(fig)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import random
 import math
 
+import numpy as np
 import pymunk
 
 
@@ -93,8 +94,7 @@ class PymunkMinimal(object):
 
             # apply forces
             if self.jitter_force > 0:
-                for body in self.space.bodies:
-                    self.apply_jitter_force(body)
+                self.apply_jitter_forces(self.space.bodies)
 
             # run for a physics timestep
             self.space.step(self.physics_dt)
@@ -108,6 +108,27 @@ class PymunkMinimal(object):
             jitter_force,
             jitter_location)
 
+    def apply_jitter_forces(self, bodies):
+        """
+        apply a jitter impulse to each of `bodies`, with the same distribution as `apply_jitter_force`.
+        The random values for all bodies are drawn together with numpy.
+        """
+        n_bodies = len(bodies)
+        if not n_bodies:
+            return
+        diameters = np.array([body.diameter for body in bodies], dtype=float)
+        sides = np.random.randint(0, 4, n_bodies)
+        offsets = np.random.uniform(0, 1, n_bodies) * diameters
+        jitter_forces = np.random.normal(0, self.jitter_force, (n_bodies, 2))
+
+        # a point along the boundary: the left and right ends (sides 0, 1) vary in x,
+        # and the bottom and top (sides 2, 3) vary in y
+        location_x = np.where(sides < 2, offsets, np.where(sides == 2, 0.0, diameters))
+        location_y = np.where(sides < 2, np.where(sides == 0, 0.0, diameters), offsets)
+        for body, jitter_force, x, y in zip(
+                bodies, jitter_forces.tolist(), location_x.tolist(), location_y.tolist()):
+            body.apply_impulse_at_local_point(jitter_force, (x, y))
+
     def add_barriers(self, bounds, barriers):
         """ Create static barriers """
         thickness = 100.0
@@ -210,27 +231,33 @@ class PymunkMinimal(object):
         mass = boundary['mass']
 
         body, shape = self.bodies[body_id]
-        position = body.position
+        if diameter == body.diameter and mass == body.mass:
+            # the body keeps its shape, so it is reset in place rather than replaced,
+            # with no rotation like a new body, and the same position and velocity
+            body.angle = 0.0
+            body.angular_velocity = 0.0
+        else:
+            position = body.position
 
-        # get shape, inertia, make body, assign body to shape
-        new_shape = self.get_shape(boundary)
-        inertia = self.get_inertia(new_shape, mass)
-        new_body = pymunk.Body(mass, inertia)
-        new_shape.body = new_body
+            # get shape, inertia, make body, assign body to shape
+            new_shape = self.get_shape(boundary)
+            inertia = self.get_inertia(new_shape, mass)
+            new_body = pymunk.Body(mass, inertia)
+            new_shape.body = new_body
 
-        new_body.position = position
-        new_body.velocity = body.velocity
-        new_body.diameter = diameter
+            new_body.position = position
+            new_body.velocity = body.velocity
+            new_body.diameter = diameter
 
-        new_shape.elasticity = shape.elasticity
-        new_shape.friction = shape.friction
+            new_shape.elasticity = shape.elasticity
+            new_shape.friction = shape.friction
 
-        # swap bodies
-        self.space.remove(body, shape)
-        self.space.add(new_body, new_shape)
+            # swap bodies
+            self.space.remove(body, shape)
+            self.space.add(new_body, new_shape)
 
-        # update body
-        self.bodies[body_id] = (new_body, new_shape)
+            # update body
+            self.bodies[body_id] = (new_body, new_shape)
 
         if 'velocity' in boundary:
             self.set_velocity(body_id, boundary['velocity'])
@@ -2,6 +2,7 @@ import os
 import math
 import random
 import itertools
+from collections.abc import Hashable
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -250,18 +251,28 @@ def get_phylogeny_colors_from_names(agent_ids):
     return agent_colors
 
 
-def format_snapshot_data(data):
+def format_snapshot_data(data, times=None):
+    """
+    get the (agents, fields) timeseries for plot_snapshots, only for `times` if they are given.
+    `data` is either the emitted data, or agent trajectories (a pandas DataFrame or pyarrow Table)
+    from the parquet emitter, which have agent locations, diameters and cell states but no fields.
+    """
+    if not isinstance(data, dict):
+        # the emitters are only imported for trajectories, which are not needed to plot emitted data
+        from tumor_tcell.library.emitters import trajectories_to_agents
+        return trajectories_to_agents(data, times=times), {}
+
+    if times is not None:
+        data = {time: data[time] for time in times}
     agents = {}
     fields = {}
     for time, time_data in data.items():
         if 'agents' in time_data:
             agents[time] = time_data['agents']
             fields[time] = time_data['fields']
-        else:
-            for compartment, compartment_data in time_data.items():
-                if compartment == 'tumor_environment':
-                    agents[time] = compartment_data['agents']
-                    fields[time] = compartment_data['fields']
+        elif 'tumor_environment' in time_data:
+            agents[time] = time_data['tumor_environment']['agents']
+            fields[time] = time_data['tumor_environment']['fields']
     return agents, fields
 
 
@@ -302,6 +313,20 @@ def get_agent_colors(agents, phylogeny_names=True):
     return agent_colors
 
 
+def get_snapshot_times(time_vec, n_snapshots=8, final_time=None):
+    """get the indices in time_vec and the times that are shown as snapshots"""
+    if final_time:
+        for t_idx, t in enumerate(time_vec):
+            if t >= final_time:
+                final_time_index = t_idx
+                time_indices = np.round(np.linspace(0, final_time_index, n_snapshots)).astype(int)
+                continue
+    else:
+        time_indices = np.round(np.linspace(0, len(time_vec) - 1, n_snapshots)).astype(int)
+    snapshot_times = [time_vec[i] for i in time_indices]
+    return time_indices, snapshot_times
+
+
 def plot_snapshots(
         bounds,
         agents={},
@@ -310,6 +335,7 @@ def plot_snapshots(
         final_time=None,
         skip_fields=[],
         include_fields=None,
+        field_range=None,
         out_dir=None,
         filename=None,
         **kwargs,
@@ -346,6 +372,8 @@ def plot_snapshots(
               ``include_fields``.
             * **include_fields** (:py:class:`Iterable`): Keys of fields
               to plot.
+            * **field_range** (:py:class:`dict`): The [min, max] of each
+              field. If not given, it is computed from ``fields``.
     '''
 
     # time steps that will be used
@@ -360,18 +388,11 @@ def plot_snapshots(
         raise Exception('No agents or field data')
 
     # get fields id and range
-    field_range = get_field_range(fields, time_vec, include_fields, skip_fields)
+    if field_range is None:
+        field_range = get_field_range(fields, time_vec, include_fields, skip_fields)
 
     # get time data
-    if final_time:
-        for t_idx, t in enumerate(time_vec):
-            if t >= final_time:
-                final_time_index = t_idx
-                time_indices = np.round(np.linspace(0, final_time_index, n_snapshots)).astype(int)
-                continue
-    else:
-        time_indices = np.round(np.linspace(0, len(time_vec) - 1, n_snapshots)).astype(int)
-    snapshot_times = [time_vec[i] for i in time_indices]
+    time_indices, snapshot_times = get_snapshot_times(time_vec, n_snapshots, final_time)
 
     return make_snapshots_figure(
         agents=agents,
@@ -399,6 +420,25 @@ def get_value_at_path(d, path):
         return None
 
 
+def get_tag_lookup(tag_colors):
+    """group tag_colors {(*path, value): color} by path, as {path: {value: color}}"""
+    tag_lookup = {}
+    for path, color in tag_colors.items():
+        tag_lookup.setdefault(tuple(path[:-1]), {})[path[-1]] = color
+    return tag_lookup
+
+
+def get_tag_agent_colors(agents, tag_lookup):
+    """get {agent_id: color} for the agents that have a tagged value, with one lookup per path"""
+    agent_colors = {}
+    for agent_id, state in agents.items():
+        for path, value_colors in tag_lookup.items():
+            value = get_value_at_path(state, path)
+            if isinstance(value, Hashable) and value in value_colors:
+                agent_colors[agent_id] = value_colors[value]
+    return agent_colors
+
+
 def make_snapshots_figure(
     agents,
     fields,
@@ -442,6 +482,7 @@ def make_snapshots_figure(
     edge_length_x = bounds[0]
     edge_length_y = bounds[1]
     tag_colors = tag_colors or {}
+    tag_lookup = get_tag_lookup(tag_colors)
     agent_colors = agent_colors or {}
 
     # make the figure
@@ -458,6 +499,10 @@ def make_snapshots_figure(
     # plot snapshot data in each subsequent column
     for col_idx, (time_idx, time) in enumerate(zip(time_indices, snapshot_times)):
 
+        # use tag_colors, once per snapshot for all of its rows
+        if agents and tag_lookup:
+            agent_colors.update(get_tag_agent_colors(agents[time], tag_lookup))
+
         if field_ids:
             for row_idx, field_id in enumerate(field_ids):
 
@@ -483,15 +528,6 @@ def make_snapshots_figure(
 
                 if agents:
                     agents_now = agents[time]
-
-                    # use tag_colors
-                    for agent_id, state in agents_now.items():
-                        for path, color in tag_colors.items():
-                            target = path[-1]
-                            value = get_value_at_path(state, path[:-1])
-                            if value == target:
-                                agent_colors[agent_id] = color
-
                     plot_agents(
                         ax, agents_now, agent_colors, agent_shape, dead_color)
 
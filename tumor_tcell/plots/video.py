@@ -1,5 +1,6 @@
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 import cv2
 import numpy as np
@@ -14,6 +15,9 @@ from tumor_tcell.plots.snapshots import (
 
 PLOT_WIDTH = 7
 
+# the snapshot function of a make_video worker process
+_worker_snapshot_fun = None
+
 
 def make_snapshot_function(
         data,
@@ -26,21 +30,33 @@ def make_snapshot_function(
     # make the snapshot plot function
     time_vec = list(multibody_agents.keys())
 
-    # get fields and agent colors
-    multibody_field_range = get_field_range(multibody_fields, time_vec)
+    # get agent colors
     multibody_agent_colors = get_agent_colors(multibody_agents)
     multibody_agent_colors.update(agent_colors)
 
+    plot_single_snapshot = snapshot_function(
+        multibody_agents, multibody_fields, bounds, multibody_agent_colors, **kwargs)
+    return plot_single_snapshot, time_vec
+
+
+def snapshot_function(agents, fields, bounds, agent_colors, **kwargs):
+    """
+    make the function that plots the snapshot at a time index, from the `agents` and `fields`
+    timeseries of `format_snapshot_data` and the `agent_colors` of every agent
+    """
+    time_vec = list(agents.keys())
+    field_range = get_field_range(fields, time_vec)
+
     def plot_single_snapshot(t_index):
         time_indices = np.array([t_index])
         snapshot_time = [time_vec[t_index]]
         fig = make_snapshots_figure(
             time_indices=time_indices,
             snapshot_times=snapshot_time,
-            agents=multibody_agents,
-            agent_colors=multibody_agent_colors,
-            fields=multibody_fields,
-            field_range=multibody_field_range,
+            agents=agents,
+            agent_colors=agent_colors,
+            fields=fields,
+            field_range=field_range,
             n_snapshots=1,
             bounds=bounds,
             default_font_size=12,
@@ -49,23 +65,39 @@ def make_snapshot_function(
             **kwargs)
         return fig
 
-    return plot_single_snapshot, time_vec
+    return plot_single_snapshot
+
+
+def save_snapshot_image(t_index, fig_path, snapshot_fun=None):
+    """plot the snapshot at `t_index` with `snapshot_fun`, or with the worker's, and save it to `fig_path`"""
+    snapshot_fun = snapshot_fun or _worker_snapshot_fun
+    fig = snapshot_fun(t_index)
+    fig.savefig(fig_path, bbox_inches='tight')
+    plt.close(fig)
+    return fig_path
+
+
+def _init_snapshot_worker(agents, fields, bounds, agent_colors, kwargs):
+    """build the snapshot function once in each worker process of make_video"""
+    global _worker_snapshot_fun
+    plt.switch_backend('Agg')
+    _worker_snapshot_fun = snapshot_function(agents, fields, bounds, agent_colors, **kwargs)
 
 
 def video_from_images(img_paths, out_file):
-    # make the video
-    img_array = []
-    size = None
+    """
+    make the video from the images in `img_paths`. The images are read and written one at a time,
+    so only one frame is held in memory. The video takes its size from the first image.
+    """
+    out = None
     for img_file in img_paths:
         img = cv2.imread(img_file)
-        height, width, layers = img.shape
-        size = (width, height)
-        img_array.append(img)
-
-    out = cv2.VideoWriter(out_file, cv2.VideoWriter_fourcc(*'mp4v'), 15, size)
-    for i in range(len(img_array)):
-        out.write(img_array[i])
-    out.release()
+        if out is None:
+            height, width, layers = img.shape
+            out = cv2.VideoWriter(out_file, cv2.VideoWriter_fourcc(*'mp4v'), 15, (width, height))
+        out.write(img)
+    if out is not None:
+        out.release()
 
 
 def make_video(
@@ -75,9 +107,14 @@ def make_video(
         agent_colors=None,
         out_dir='out',
         filename='snapshot_vid',
+        workers=1,
         **kwargs
 ):
-    """Make a video with snapshots across time """
+    """Make a video with snapshots across time
+
+    The snapshot images are independent, and can be rendered by `workers` processes. Each worker
+    gets its own copy of the snapshot data, so they are only started when `workers` is above 1.
+    """
 
     # make images directory, remove if existing
     out_file = os.path.join(out_dir, f'{filename}.mp4')
@@ -86,22 +123,29 @@ def make_video(
         shutil.rmtree(images_dir)
     os.makedirs(images_dir)
 
-    # get the single snapshots function
-    snapshot_fun, time_vec = make_snapshot_function(
-        data,
-        bounds,
-        agent_colors=agent_colors,
-        **kwargs)
+    # the agent colors are drawn randomly, so they are picked here to be the same in every worker
+    multibody_agents, multibody_fields = format_snapshot_data(data)
+    agent_colors = dict(get_agent_colors(multibody_agents), **(agent_colors or {}))
+    time_vec = list(multibody_agents.keys())
 
     # make the individual snapshot figures
-    img_paths = []
-    for t_index in range(0, len(time_vec) - 1, step):
-        fig_path = os.path.join(images_dir, f"img{t_index}.jpg")
-        img_paths.append(fig_path)
-
-        fig = snapshot_fun(t_index)
-        fig.savefig(fig_path, bbox_inches='tight')
-        plt.close()
+    t_indices = list(range(0, len(time_vec) - 1, step))
+    img_paths = [
+        os.path.join(images_dir, f"img{t_index}.jpg")
+        for t_index in t_indices]
+    if workers > 1:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_snapshot_worker,
+                initargs=(multibody_agents, multibody_fields, bounds, agent_colors, kwargs),
+        ) as executor:
+            list(executor.map(save_snapshot_image, t_indices, img_paths))
+    else:
+        # get the single snapshots function, from the data that is already formatted
+        snapshot_fun = snapshot_function(
+            multibody_agents, multibody_fields, bounds, agent_colors, **kwargs)
+        for t_index, fig_path in zip(t_indices, img_paths):
+            save_snapshot_image(t_index, fig_path, snapshot_fun)
 
     # make the video
     video_from_images(img_paths, out_file)
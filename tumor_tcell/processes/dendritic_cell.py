@@ -10,7 +10,6 @@ from scipy import constants
 from vivarium.core.process import Process
 from vivarium.core.composer import Composite
 from vivarium.core.engine import Engine
-from vivarium.plots.simulation_output import plot_simulation_output
 from vivarium.library.units import units
 from vivarium.processes.timeline import TimelineProcess
 
@@ -303,6 +302,7 @@ def test_single_d_cell(
 
     # plot
     plot_settings = {'remove_zeros': False}
+    from vivarium.plots.simulation_output import plot_simulation_output
     plot_simulation_output(timeseries, plot_settings, out_dir, 'dendritic_cell_single')
 
 
@@ -8,10 +8,16 @@ Diffuses and decays molecular concentrations in a 2D field.
 
 import os
 import copy
+import time as clock
 import cv2
 import numpy as np
 from scipy import constants
 # from scipy.ndimage import convolve
+try:
+    from numba import njit
+except ImportError:
+    # without numba, diffusion runs through cv2.filter2D
+    njit = None
 
 from vivarium.core.serialize import Quantity
 from vivarium.core.process import Process
@@ -22,8 +28,7 @@ from vivarium_multibody.library.lattice_utils import (
     get_bin_volume,
 )
 
-# plotting
-from tumor_tcell.plots.snapshots import plot_snapshots
+from tumor_tcell.library.location import magnitude_as
 
 # directories
 from tumor_tcell import PROCESS_OUT_DIR
@@ -42,6 +47,59 @@ DIFFUSION_RATES = {
 }
 
 
+def diffuse_steps(field, n_steps, diffusion_rate_dt):
+    """
+    run n_steps of explicit diffusion on a 2D field, in place.
+
+    This is the same update as cv2.filter2D with LAPLACIAN_2D, which reflects at the
+    edges without repeating the edge bin (cv2.BORDER_REFLECT_101). The field is copied into
+    a buffer with a one-bin halo that holds the reflected edges, so the stencil has no branches,
+    and each step reads one buffer and writes the other in a single pass.
+    """
+    n_x, n_y = field.shape
+    current = np.empty((n_x + 2, n_y + 2))
+    updated = np.empty((n_x + 2, n_y + 2))
+    current[1:-1, 1:-1] = field
+    for _ in range(n_steps):
+        # reflect the edges into the halo
+        for j in range(1, n_y + 1):
+            current[0, j] = current[min(2, n_x), j]
+            current[n_x + 1, j] = current[max(n_x - 1, 1), j]
+        for i in range(1, n_x + 1):
+            current[i, 0] = current[i, min(2, n_y)]
+            current[i, n_y + 1] = current[i, max(n_y - 1, 1)]
+
+        for i in range(1, n_x + 1):
+            for j in range(1, n_y + 1):
+                updated[i, j] = current[i, j] + diffusion_rate_dt * (
+                    current[i - 1, j] + current[i + 1, j] +
+                    current[i, j - 1] + current[i, j + 1] -
+                    4.0 * current[i, j])
+        current, updated = updated, current
+    field[:, :] = current[1:-1, 1:-1]
+    return field
+
+
+if njit is not None:
+    diffuse_steps = njit(cache=True, boundscheck=False)(diffuse_steps)
+
+
+def precompile_kernels():
+    """
+    compile the numba kernels for the argument types that `Fields` uses, so that the first diffusion
+    step does not pay for compilation. The compiled kernels are cached next to this module, so later runs
+    load them from the cache. Returns the seconds spent compiling, which is 0.0 for cached kernels or
+    without numba.
+    """
+    if njit is None:
+        return 0.0
+    clock_start = clock.time()
+    diffuse_steps(np.zeros((2, 2), dtype=np.float64), 1, 0.0)
+    if sum(diffuse_steps.stats.cache_misses.values()) == 0:
+        return 0.0
+    return clock.time() - clock_start
+
+
 class Fields(Process):
     """
     Diffusion and decay in 2-dimensional fields of molecules with agent exchange of molecules
@@ -117,6 +175,14 @@ class Fields(Process):
             mol_id: diff_rate.to(LENGTH_UNIT**2/units.s).magnitude/dx2
             for mol_id, diff_rate in self.parameters['diffusion'].items()}
 
+        # diffusion and decay rates in the order of molecule_ids, so they are not looked up each step
+        self.diffusion_rates = [
+            self.molecule_specific_diffusion.get(mol_id, self.diffusion_rate)
+            for mol_id in self.molecule_ids]
+        self.decay_rates = [
+            self.parameters['decay'].get(mol_id)
+            for mol_id in self.molecule_ids]
+
         # get diffusion timestep
         diffusion_dt = 0.5 * dx ** 2 * dy ** 2 / (2 * diffusion_rate * (dx ** 2 + dy ** 2))
         self.diffusion_dt = min(diffusion_dt, self.parameters['default_diffusion_dt'])
@@ -234,7 +300,7 @@ class Fields(Process):
 
     def get_bin_site(self, location):
         return get_bin_site(
-            [l.to(LENGTH_UNIT).magnitude for l in location],
+            [magnitude_as(l, LENGTH_UNIT) for l in location],
             self.n_bins,
             self.bounds)
 
@@ -245,18 +311,39 @@ class Fields(Process):
             local_environment[mol_id] = field[bin_site]
         return local_environment
 
+    def get_bin_sites(self, locations):
+        """
+        bin indices for an (n, 2) array of unitless `locations`, as an array of x indices and an array
+        of y indices. This is `get_bin_site` for all locations at once.
+        """
+        n_bins = np.asarray(self.n_bins)
+        bin_sites = np.floor(locations * n_bins / np.asarray(self.bounds)).astype(int) % n_bins
+        return bin_sites[:, 0], bin_sites[:, 1]
+
     def set_local_environments(self, cells, fields):
+        """
+        read each agent's local concentrations from the fields. The agents' locations are gathered into
+        one array, so their bins are found and read from the fields for all agents and molecules at once.
+        """
         local_environments = {}
         if cells:
-            for agent_id, specs in cells.items():
-                local_environments[agent_id] = {'boundary': {'external': {}}}
-                cell_environment = self.get_single_local_environments(specs['boundary'], fields)
-                local_environments[agent_id]['boundary']['external'] = {
+            agent_ids = list(cells.keys())
+            locations = np.array([
+                [magnitude_as(loc, LENGTH_UNIT) for loc in cells[agent_id]['boundary']['location']]
+                for agent_id in agent_ids], dtype=float).reshape(-1, 2)
+            bin_x, bin_y = self.get_bin_sites(locations)
+
+            # stack the fields in the order of molecule_ids, to read all molecules with one index,
+            # and get a row of values for each agent
+            stacked_fields = np.stack([fields[mol_id] for mol_id in self.molecule_ids])
+            agent_values = stacked_fields[:, bin_x, bin_y].T.tolist()
+            for agent_id, values in zip(agent_ids, agent_values):
+                local_environments[agent_id] = {'boundary': {'external': {
                     mol_id: {
                         '_value': value,
                         '_updater': 'set'  # this overrides the default updater
-                    } for mol_id, value in cell_environment.items()
-                }
+                    } for mol_id, value in zip(self.molecule_ids, values)
+                }}}
         return local_environments
 
     def ones_field(self):
@@ -275,6 +362,13 @@ class Fields(Process):
         t = 0.0
         dt = min(timestep, self.diffusion_dt)
         diffusion_rate_dt = diffusion_rate * dt
+        if njit is not None:
+            # count the steps, and run them all in the compiled loop
+            n_steps = 0
+            while t < timestep:
+                n_steps += 1
+                t += dt
+            return diffuse_steps(np.ascontiguousarray(field, dtype=np.float64), n_steps, diffusion_rate_dt)
         while t < timestep:
             result = cv2.filter2D(field, -1, LAPLACIAN_2D)
             # result = convolve(field, LAPLACIAN_2D, mode='reflect')
@@ -284,10 +378,10 @@ class Fields(Process):
 
     def diffuse_fields(self, fields, timestep):
         """ diffuse fields in a fields dictionary """
-        for mol_id, field in fields.items():
-            diffusion_rate = self.molecule_specific_diffusion.get(mol_id, self.diffusion_rate)
+        for mol_id, diffusion_rate in zip(self.molecule_ids, self.diffusion_rates):
+            field = fields[mol_id]
             # run diffusion if molecule field is not uniform
-            if len(set(field.flatten())) != 1:
+            if not np.all(field == field.flat[0]):
                 fields[mol_id] = self.diffuse(field, timestep, diffusion_rate)
         return fields
 
@@ -295,11 +389,9 @@ class Fields(Process):
         """
         Note: this only applies if the molecule has a rate in parameters['decay']
         """
-        for mol_id, field in fields.items():
-            if mol_id in self.parameters['decay']:
-                decay_rate = self.parameters['decay'][mol_id]
-                degraded = field * np.exp(-decay_rate * timestep)
-                fields[mol_id] = degraded
+        for mol_id, decay_rate in zip(self.molecule_ids, self.decay_rates):
+            if decay_rate is not None:
+                fields[mol_id] = fields[mol_id] * np.exp(-decay_rate * timestep)
         return fields
 
 
@@ -330,6 +422,7 @@ def plot_fields(data, config, out_dir='out', filename='fields'):
     plot_config = {
         'out_dir': out_dir,
         'filename': filename}
+    from tumor_tcell.plots.snapshots import plot_snapshots
     plot_snapshots(snapshots_data, plot_config)
 
 def main():
@@ -12,7 +12,7 @@ import random
 from vivarium.core.process import Process
 from vivarium.core.engine import pp, Engine
 from tumor_tcell.processes.t_cell import get_probability_timestep, TIMESTEP
-from tumor_tcell.library.location import random_location, DEFAULT_BOUNDS
+from tumor_tcell.library.location import random_locations, DEFAULT_BOUNDS
 from tumor_tcell.processes.local_field import LENGTH_UNIT
 from tumor_tcell.processes.neighbors import DEFAULT_MASS_UNIT, DEFAULT_VELOCITY_UNIT
 
@@ -71,6 +71,29 @@ class LymphNode(Process):
 
     def __init__(self, parameters=None):
         super().__init__(parameters)
+        # arriving t cells are placed within this distance from the center of the tumor environment
+        self.arrival_distance = self.parameters['tumor_env_bounds'][0] / 5
+        self.transition_probabilities = {}
+
+    def get_transition_probabilities(self, timestep):
+        """the probability of each cell transition within `timestep`, computed once for each timestep"""
+        if timestep not in self.transition_probabilities:
+            self.transition_probabilities[timestep] = {
+                'interaction_completion': probability_of_occurrence_within_interval(
+                    timestep, self.parameters['expected_interaction_duration']),
+                'migration': probability_of_occurrence_within_interval(
+                    timestep, self.parameters['expected_delay_before_migration']),
+                # TODO -- this should depend on dendritic cell being present. Not interacting alone
+                'interaction': get_probability_timestep(
+                    self.parameters['tcell_find_dendritic_time'],
+                    14400,  # 14400 6 hours (6*60*60 seconds)
+                    timestep),  # (Itano, 2003)
+                'dendritic_arrival': probability_of_occurrence_within_interval(
+                    timestep, self.parameters['expected_dendritic_transit_time']),
+                'tcell_arrival': probability_of_occurrence_within_interval(
+                    timestep, self.parameters['expected_tcell_transit_time']),
+            }
+        return self.transition_probabilities[timestep]
 
     def initial_state(self, config=None):
         if config:
@@ -125,6 +148,7 @@ class LymphNode(Process):
         microenvironment_cells = states['cells']['agents']
         lymph_node_cells = states['lymph_node']['agents']
         in_transit = states['in_transit']['agents']
+        probabilities = self.get_transition_probabilities(timestep)
 
         cells_update = {}
         in_transit_update = {}
@@ -151,9 +175,7 @@ class LymphNode(Process):
             if cell_type == 't-cell' and dendritic_cells_present:
                 if cell_state == 'interacting':
                     # interact with dendritic cells for 8 hours, then 12-hour delay before migrating to tumor
-                    prob_interaction_completion = probability_of_occurrence_within_interval(
-                        timestep, self.parameters['expected_interaction_duration'])
-                    if random.uniform(0, 1) < prob_interaction_completion:
+                    if random.uniform(0, 1) < probabilities['interaction_completion']:
                         # first delay, then migrate
                         lymph_node_update[cell_id] = {
                             'internal': {'cell_state': 'delay'}
@@ -161,9 +183,7 @@ class LymphNode(Process):
 
                 elif cell_state == 'delay':
                     # get probability of migration starting
-                    prob_migration = probability_of_occurrence_within_interval(
-                        timestep, self.parameters['expected_delay_before_migration'])
-                    if random.uniform(0, 1) < prob_migration:
+                    if random.uniform(0, 1) < probabilities['migration']:
                         if '_move' not in lymph_node_update:
                             lymph_node_update['_move'] = []
                         # begin transit from lymph node
@@ -173,13 +193,8 @@ class LymphNode(Process):
                             'update': {'internal': {'cell_state': 'PD1n'}}})
 
                 else:
-                    # Calculate probability of finding/initializing interaction with dendritic cells
-                    # TODO -- this should depend on dendritic cell being present. Not interacting alone
-                    prob_interaction = get_probability_timestep(
-                        self.parameters['tcell_find_dendritic_time'],
-                        14400,  # 14400 6 hours (6*60*60 seconds)
-                        timestep)  # (Itano, 2003)
-                    if random.uniform(0, 1) < prob_interaction:
+                    # probability of finding/initializing interaction with dendritic cells
+                    if random.uniform(0, 1) < probabilities['interaction']:
                         # this t-cell is now interacting
                         lymph_node_update[cell_id] = {'internal': {'cell_state': 'interacting'}}
 
@@ -208,14 +223,13 @@ class LymphNode(Process):
         # in transit #
         ##############
 
+        arriving_tcells = []
         for cell_id, specs in in_transit.items():
             cell_type = specs['boundary']['cell_type']
 
             if cell_type == 'dendritic':
                 # dendritic cells move only from tumor to LN
-                prob_arrival = probability_of_occurrence_within_interval(
-                    timestep, self.parameters['expected_dendritic_transit_time'])
-                if random.uniform(0, 1) < prob_arrival:
+                if random.uniform(0, 1) < probabilities['dendritic_arrival']:
                     if '_move' not in in_transit_update:
                         in_transit_update['_move'] = []
                     # arrive at lymph node
@@ -225,21 +239,25 @@ class LymphNode(Process):
 
             if cell_type == 't-cell':
                 # tcells move from in_transit to tumor
-                prob_arrival = probability_of_occurrence_within_interval(
-                    timestep, self.parameters['expected_tcell_transit_time'])
-                if random.uniform(0, 1) < prob_arrival:
-                    if '_move' not in in_transit_update:
-                        in_transit_update['_move'] = []
-                    # arrive at tumor
-                    location = random_location(bounds=self.parameters['tumor_env_bounds'],
-                                               center=None,
-                                               distance_from_center=self.parameters['tumor_env_bounds'][0]/5,
-                                               excluded_distance_from_center=None,)
-                    specs['boundary']['location'] = location  # TODO -- need to add this location in move
-                    in_transit_update['_move'].append({
-                        'source': (cell_id,),
-                        'target': ('cells', 'agents'),
-                        'update': {'boundary': {'location': location}}})
+                if random.uniform(0, 1) < probabilities['tcell_arrival']:
+                    arriving_tcells.append((cell_id, specs))
+
+        # arrive at tumor, with the locations of all arriving tcells drawn together
+        if arriving_tcells:
+            locations = random_locations(
+                len(arriving_tcells),
+                bounds=self.parameters['tumor_env_bounds'],
+                center=None,
+                distance_from_center=self.arrival_distance,
+                excluded_distance_from_center=None)
+            if '_move' not in in_transit_update:
+                in_transit_update['_move'] = []
+            for (cell_id, specs), location in zip(arriving_tcells, locations):
+                specs['boundary']['location'] = location  # TODO -- need to add this location in move
+                in_transit_update['_move'].append({
+                    'source': (cell_id,),
+                    'target': ('cells', 'agents'),
+                    'update': {'boundary': {'location': location}}})
 
         return {
             'cells': {'agents': cells_update},
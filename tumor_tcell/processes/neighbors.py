@@ -25,11 +25,9 @@ import math
 import copy
 
 import numpy as np
+from scipy.spatial import cKDTree
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-
-from tumor_tcell.library.location import DEFAULT_BOUNDS, DEFAULT_LENGTH_UNIT
+from tumor_tcell.library.location import DEFAULT_BOUNDS, DEFAULT_LENGTH_UNIT, magnitude_as
 # vivarium imports
 from tumor_tcell.library.pymunk_minimal import PymunkMinimal as Pymunk
 from vivarium.library.units import units, remove_units
@@ -93,6 +91,31 @@ def remove_from_dict(dict, removed):
     return dict
 
 
+def find_neighbor_pairs(positions_a, radii_a, positions_b, radii_b, neighbor_distance):
+    """Find the pairs of cells from a and b that are within neighbor_distance of each other's outer boundary
+
+    The cells of a and b are indexed in KD-trees, and the pairs of centers that are within the largest
+    possible interaction distance are found in one query. The pairs are then filtered by their actual radii.
+
+    Returns:
+        (index_a, index_b, inner_distance) arrays, sorted by index_a and then index_b.
+    """
+    if not len(positions_a) or not len(positions_b):
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+    max_distance = radii_a.max() + radii_b.max() + neighbor_distance
+    pairs = cKDTree(positions_a).sparse_distance_matrix(
+        cKDTree(positions_b), max_distance, output_type='ndarray')
+    index_a = pairs['i'].astype(int)
+    index_b = pairs['j'].astype(int)
+
+    # keep the pairs that are close enough
+    inner_distance = pairs['v'] - radii_a[index_a] - radii_b[index_b]
+    close = inner_distance <= neighbor_distance
+    index_a, index_b, inner_distance = index_a[close], index_b[close], inner_distance[close]
+    order = np.lexsort((index_b, index_a))
+    return index_a[order], index_b[order], inner_distance[order]
+
+
 class Neighbors(Process):
     """Neighbors process for tracking cell bodies.
 
@@ -155,6 +178,7 @@ class Neighbors(Process):
         # interactive plot for visualization
         self.animate = self.parameters['animate']
         if self.animate:
+            import matplotlib.pyplot as plt
             plt.ion()
             self.ax = plt.gca()
             self.ax.set_aspect('equal')
@@ -274,20 +298,23 @@ class Neighbors(Process):
         This is required for interfacing the physics engine, which does not track units
         """
         for bodies_id, specs in bodies.items():
+            boundary = specs['boundary']
             # convert location
-            bodies[bodies_id]['boundary']['location'] = [loc.to(self.length_unit).magnitude for loc in
-                                                         specs['boundary']['location']]
+            boundary['location'] = [magnitude_as(loc, self.length_unit) for loc in boundary['location']]
             # convert diameter
-            bodies[bodies_id]['boundary']['diameter'] = specs['boundary']['diameter'].to(self.length_unit).magnitude
+            boundary['diameter'] = magnitude_as(boundary['diameter'], self.length_unit)
             # convert mass
-            bodies[bodies_id]['boundary']['mass'] = specs['boundary']['mass'].to(self.mass_unit).magnitude
+            boundary['mass'] = magnitude_as(boundary['mass'], self.mass_unit)
             # convert velocity
-            bodies[bodies_id]['boundary']['velocity'] = specs['boundary']['velocity'].to(self.velocity_unit).magnitude
+            boundary['velocity'] = magnitude_as(boundary['velocity'], self.velocity_unit)
         return bodies
 
     def location_add_units(self, bodies):
+        # constructing the Quantities directly is much faster than multiplying by the unit
+        quantity = units.Quantity
+        length_unit = self.length_unit
         for body_id, location in bodies.items():
-            bodies[body_id] = [(loc * self.length_unit) for loc in location]
+            bodies[body_id] = [quantity(loc, length_unit) for loc in location]
         return bodies
 
     def get_neighbors(self, cell_loc, cell_radius, neighbor_loc, neighbor_radius):
@@ -302,48 +329,53 @@ class Neighbors(Process):
 
     def get_all_neighbors(self, cells, current_positions):
         """
-        only count neighbor if they are within 'neighbor_distance' from outer boundary of cell
-        """
+        only count neighbor if they are within 'neighbor_distance' from outer boundary of cell.
 
-        tcell_positions = {
-            cell_id: current_positions[cell_id]
-            for cell_id, specs in cells.items()
-            if specs['boundary']['cell_type'] == 't-cell'}
-        tumor_positions = {
-            cell_id: current_positions[cell_id]
-            for cell_id, specs in cells.items()
-            if specs['boundary']['cell_type'] == 'tumor'}
-        cell_radii = {
-            cell_id: (specs['boundary']['diameter'] / 2)
-            for cell_id, specs in cells.items()}
-
-        cell_neighbors = {}
-
-        # t-cells polarize to one tumor cell: find the closest
-        for cell_id, location in tcell_positions.items():
-            radius = cell_radii[cell_id]
-            neighbors = self.get_neighbors(location, radius, tumor_positions, cell_radii)
-            if neighbors:
-                cell_neighbors[cell_id] = [min(neighbors, key=neighbors.get)]
-            else:
-                cell_neighbors[cell_id] = []
+        The cells' types, positions, and radii are gathered into arrays with a row for each cell,
+        the t cells and tumors are selected from them by type, and all the neighboring pairs are
+        found at once with `find_neighbor_pairs`.
+        """
+        cell_ids = list(cells.keys())
+        cell_types = np.array([cells[cell_id]['boundary']['cell_type'] for cell_id in cell_ids], dtype=str)
+        positions = np.array(
+            [current_positions[cell_id] for cell_id in cell_ids], dtype=float).reshape(-1, 2)
+        radii = np.array(
+            [cells[cell_id]['boundary']['diameter'] for cell_id in cell_ids], dtype=float) / 2
+
+        tcell_rows = np.flatnonzero(cell_types == 't-cell')
+        tumor_rows = np.flatnonzero(cell_types == 'tumor')
+        tcell_ids = [cell_ids[row] for row in tcell_rows.tolist()]
+        tumor_ids = [cell_ids[row] for row in tumor_rows.tolist()]
+        tcell_positions, tcell_radii = positions[tcell_rows], radii[tcell_rows]
+        tumor_positions, tumor_radii = positions[tumor_rows], radii[tumor_rows]
+
+        tcell_index, tumor_index, inner_distance = find_neighbor_pairs(
+            tcell_positions, tcell_radii, tumor_positions, tumor_radii, self.neighbor_distance)
+
+        cell_neighbors = {cell_id: [] for cell_id in tcell_ids}
+        cell_neighbors.update({cell_id: [] for cell_id in tumor_ids})
+
+        # t-cells polarize to one tumor cell: find the closest, or the first of equally close tumors
+        closest = np.lexsort((tumor_index, inner_distance, tcell_index))
+        _, first = np.unique(tcell_index[closest], return_index=True)
+        for tcell, tumor in zip(tcell_index[closest][first].tolist(), tumor_index[closest][first].tolist()):
+            cell_neighbors[tcell_ids[tcell]] = [tumor_ids[tumor]]
 
         # tumors can have multiple t-cell neighbors
-        for cell_id, location in tumor_positions.items():
-            radius = cell_radii[cell_id]
-            neighbors = self.get_neighbors(location, radius, tcell_positions, cell_radii)
-            if neighbors:
-                cell_neighbors[cell_id] = list(neighbors.keys())
-            else:
-                cell_neighbors[cell_id] = []
+        by_tumor = np.lexsort((tcell_index, tumor_index))
+        for tumor, tcell in zip(tumor_index[by_tumor].tolist(), tcell_index[by_tumor].tolist()):
+            cell_neighbors[tumor_ids[tumor]].append(tcell_ids[tcell])
 
         return cell_neighbors
 
     def remove_length_units(self, value):
-        return value.to(self.length_unit).magnitude
+        return magnitude_as(value, self.length_unit)
 
     def animate_frame(self, cells):
         """matplotlib interactive plot"""
+        import matplotlib.pyplot as plt
+        import matplotlib.patches as patches
+
         plt.cla()
         bounds = copy.deepcopy(self.parameters['bounds'])
         for cell_id, data in cells.items():
@@ -420,6 +452,24 @@ default_gd_config.update(cell_body_config({
     'cell_ids': ['1', '2']}))
 
 
+def test_find_neighbor_pairs(n_a=200, n_b=150, seed=0):
+    """the KD-tree search finds the same pairs as comparing every pair of cells"""
+    rng = np.random.default_rng(seed)
+    positions_a = rng.uniform(0, 200, (n_a, 2))
+    positions_b = rng.uniform(0, 200, (n_b, 2))
+    radii_a = np.full(n_a, 3.75)
+    radii_b = rng.uniform(5.0, 7.5, n_b)
+    index_a, index_b, inner_distance = find_neighbor_pairs(
+        positions_a, radii_a, positions_b, radii_b, 1.0)
+
+    all_distances = np.sqrt(
+        ((positions_a[:, None] - positions_b[None]) ** 2).sum(axis=2)) - radii_a[:, None] - radii_b[None]
+    expected_a, expected_b = np.nonzero(all_distances <= 1.0)
+    assert np.array_equal(index_a, expected_a)
+    assert np.array_equal(index_b, expected_b)
+    assert np.allclose(inner_distance, all_distances[expected_a, expected_b])
+
+
 def test_growth_division(config=default_gd_config, settings={}):
     initial_cells_state = config['cells']
 
@@ -29,8 +29,6 @@ import argparse
 from vivarium.library.units import units
 from vivarium.core.process import Process
 from vivarium.core.composition import simulate_process
-from vivarium.plots.agents_multigen import plot_agents_multigen
-from vivarium.plots.simulation_output import plot_simulation_output
 
 # directories
 from tumor_tcell import PROCESS_OUT_DIR
@@ -38,6 +36,7 @@ from tumor_tcell import PROCESS_OUT_DIR
 NAME = 'T_cell'
 TIMESTEP = 60  # seconds
 CONCENTRATION_UNIT = 1  # TODO: units.ng / units.mL
+DAUGHTER_VELOCITY = 10.0 * units.um / units.min
 
 
 def lymph_node_division(mother_value, **args):
@@ -55,7 +54,7 @@ def assymetric_division(mother_value, **args):
 
 def set_velocity_default(mother_value, **args):
     """Resets daughter velocities"""
-    return [10.0 * units.um / units.min, 10.0 * units.um / units.min]
+    return [DAUGHTER_VELOCITY, DAUGHTER_VELOCITY]
 
 
 def get_probability_timestep(probability_parameter, timescale, timestep):
@@ -589,6 +588,7 @@ def test_single_t_cell(
 
     # plot
     plot_settings = {'remove_zeros': False}
+    from vivarium.plots.simulation_output import plot_simulation_output
     plot_simulation_output(timeseries, plot_settings, out_dir, NAME + '_single')
 
 
@@ -648,6 +648,7 @@ def test_batch_t_cell(
 
     plot_settings = {
         'agents_key': 'agents'}
+    from vivarium.plots.agents_multigen import plot_agents_multigen
     plot_agents_multigen(combined_raw_data, plot_settings, out_dir, NAME + '_batch')
 
 
@@ -29,12 +29,11 @@ from scipy import constants
 from vivarium.library.units import units
 from vivarium.core.process import Process
 from vivarium.core.composition import simulate_process
-from vivarium.plots.agents_multigen import plot_agents_multigen
-from vivarium.plots.simulation_output import plot_simulation_output
 
 # directories
 from tumor_tcell import PROCESS_OUT_DIR
 from tumor_tcell.processes.fields import DIFFUSION_RATES, CONCENTRATION_UNIT
+from tumor_tcell.library.location import magnitude_as
 
 NAME = 'Tumor'
 TIMESTEP = 60
@@ -42,6 +41,10 @@ CONCENTRATION_UNIT_CONVERSION = 1  # ng/mL
 AVOGADRO = constants.N_A
 PI = constants.pi
 
+# the units are looked up once, since each lookup from the unit registry is slow
+LENGTH_UNIT = units.um
+ZERO_VELOCITY = 0.0 * units.um / units.s
+
 
 def get_probability_timestep(probability_parameter, timescale, timestep):
     """transition probability as function of time"""
@@ -155,7 +158,7 @@ class TumorCellProcess(Process):
                 'mass': {'_value': self.parameters['mass']},
                 'diameter': {'_default': self.parameters['diameter']},
                 'velocity': {
-                    '_default': 0.0 * units.um / units.s,
+                    '_default': ZERO_VELOCITY,
                     '_updater': 'set'},
                 'external': {
                     'IFNg': {  # cytokine changes tumor phenotype to MHCI+ and PDL1+
@@ -201,7 +204,7 @@ class TumorCellProcess(Process):
         internal_IFNg = states['internal']['IFNg']  # counts
 
         # determine available IFNg
-        diameter = states['boundary']['diameter'].to('micrometer').magnitude  # micrometer
+        diameter = magnitude_as(states['boundary']['diameter'], LENGTH_UNIT)  # micrometer
 
         # calculate diffusion distance in the timestep
         diffusion_area = self.diffusion_micrometer_squared_per_second['IFNg'] * timestep  # micrometers ** 2
@@ -379,6 +382,7 @@ def test_single_Tumor(
 
     # plot
     plot_settings = {'remove_zeros': False}
+    from vivarium.plots.simulation_output import plot_simulation_output
     plot_simulation_output(timeseries, plot_settings, out_dir, NAME + '_single')
 
 
@@ -432,6 +436,7 @@ def test_batch_tumor(
 
     plot_settings = {
         'agents_key': 'agents'}
+    from vivarium.plots.agents_multigen import plot_agents_multigen
     plot_agents_multigen(combined_raw_data, plot_settings, out_dir, NAME + '_batch')
 
 